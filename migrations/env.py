@@ -3,8 +3,8 @@ from logging.config import fileConfig
 from pathlib import Path
 
 from alembic import context
+from flask import current_app, has_app_context
 
-from skyframe import create_app
 from skyframe.extensions import db
 
 config = context.config
@@ -12,9 +12,17 @@ ini_path = Path(config.config_file_name or "alembic.ini")
 if not ini_path.exists():
     ini_path = Path(__file__).resolve().parents[1] / "alembic.ini"
     config.config_file_name = str(ini_path)
-fileConfig(ini_path)
+# Keep loggers configured by an already running app (e.g. under `flask db`).
+fileConfig(ini_path, disable_existing_loggers=False)
 
-app = create_app(os.getenv("FLASK_ENV", "default"))
+if has_app_context():
+    # `flask db ...` runs inside the CLI's app context; reuse that app
+    # instead of building and configuring a second one.
+    app = current_app._get_current_object()
+else:
+    from skyframe import create_app
+
+    app = create_app(os.getenv("FLASK_ENV", "default"))
 with app.app_context():
     config.set_main_option("sqlalchemy.url", app.config["SQLALCHEMY_DATABASE_URI"])
     target_metadata = db.metadata
@@ -33,7 +41,13 @@ with app.app_context():
     def run_migrations_online():
         connectable = db.engine
         with connectable.connect() as connection:
-            context.configure(connection=connection, target_metadata=target_metadata)
+            # One transaction per revision so migrations building indexes
+            # CONCURRENTLY inside autocommit_block() only commit their own work.
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                transaction_per_migration=True,
+            )
             with context.begin_transaction():
                 context.run_migrations()
 
@@ -0,0 +1,34 @@
+"""Add reverse-direction covering indexes on likes, favorites and follows"""
+
+from alembic import op
+
+revision = "2a9e5c7d8b14"
+down_revision = "c8a1f4e6b053"
+branch_labels = None
+depends_on = None
+
+# The composite primary keys already lead with the acting user, so the
+# per-user edge loads are index-only; these cover lookups from the other side.
+REVERSE_INDEXES = (
+    ("ix_likes_image_user", "likes", ["image_id", "user_id"], ["created_at"]),
+    ("ix_favorites_image_user", "favorites", ["image_id", "user_id"], []),
+    ("ix_follows_followed_follower", "follows", ["followed_id", "follower_id"], []),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in REVERSE_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_include=include,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _include in REVERSE_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""Add integer copies of image perceptual hashes"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "5d9f0b3a7e12"
+down_revision = "e4b6a2d9c731"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("images", sa.Column("signature_phash_bits", sa.BigInteger(), nullable=True))
+    op.add_column("images", sa.Column("signature_dhash_bits", sa.BigInteger(), nullable=True))
+    # bit(64) -> bigint reinterprets the hex digits as a two's complement value.
+    op.execute(
+        "UPDATE images SET "
+        "signature_phash_bits = ('x' || signature_phash)::bit(64)::bigint, "
+        "signature_dhash_bits = ('x' || signature_dhash)::bit(64)::bigint "
+        "WHERE signature_phash ~ '^[0-9a-fA-F]{16}$' "
+        "AND signature_dhash ~ '^[0-9a-fA-F]{16}$'"
+    )
+
+
+def downgrade():
+    op.drop_column("images", "signature_dhash_bits")
+    op.drop_column("images", "signature_phash_bits")
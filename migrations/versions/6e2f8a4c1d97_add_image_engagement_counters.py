@@ -0,0 +1,35 @@
+"""Add denormalized like/favorite/comment counters to images"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "6e2f8a4c1d97"
+down_revision = "2a9e5c7d8b14"
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    ("like_count", "likes"),
+    ("favorite_count", "favorites"),
+    ("comment_count", "comments"),
+)
+
+
+def upgrade():
+    for column, _table in COUNTERS:
+        op.add_column(
+            "images",
+            sa.Column(column, sa.Integer(), server_default="0", nullable=False),
+        )
+    op.execute(
+        "UPDATE images SET "
+        + ", ".join(
+            f"{column} = (SELECT count(*) FROM {table} WHERE {table}.image_id = images.id)"
+            for column, table in COUNTERS
+        )
+    )
+
+
+def downgrade():
+    for column, _table in reversed(COUNTERS):
+        op.drop_column("images", column)
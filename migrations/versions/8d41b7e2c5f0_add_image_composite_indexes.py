@@ -0,0 +1,36 @@
+"""Replace single-column image filter indexes with created_at composites"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "8d41b7e2c5f0"
+down_revision = "b1c2d3e4f5a6"
+branch_labels = None
+depends_on = None
+
+COMPOSITE_INDEXES = (
+    ("ix_images_category_created", "category", "ix_images_category"),
+    ("ix_images_object_created", "object_name", "ix_images_object"),
+    ("ix_images_observer_created", "observer_name", "ix_images_observer"),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, column, _legacy in COMPOSITE_INDEXES:
+            op.create_index(
+                name,
+                "images",
+                [column, sa.text("created_at DESC")],
+                postgresql_concurrently=True,
+            )
+        for _name, _column, legacy in COMPOSITE_INDEXES:
+            op.drop_index(legacy, table_name="images", postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for _name, column, legacy in COMPOSITE_INDEXES:
+            op.create_index(legacy, "images", [column], postgresql_concurrently=True)
+        for name, _column, _legacy in COMPOSITE_INDEXES:
+            op.drop_index(name, table_name="images", postgresql_concurrently=True)
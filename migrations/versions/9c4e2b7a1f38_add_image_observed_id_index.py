@@ -0,0 +1,31 @@
+"""Replace the observed_at image index with an (observed_at, id) keyset index"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "9c4e2b7a1f38"
+down_revision = "6e2f8a4c1d97"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Matches the feed's ORDER BY observed_at DESC, id DESC and its
+    # (observed_at, id) < (...) cursor; the leading column still serves the
+    # observed_at range filters the old single-column index covered.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_images_observed_id",
+            "images",
+            [sa.text("observed_at DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_images_observed_at", table_name="images", postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_images_observed_at", "images", ["observed_at"], postgresql_concurrently=True
+        )
+        op.drop_index("ix_images_observed_id", table_name="images", postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""Replace motd published index with a partial index on live rows"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "a7c3e9f1d284"
+down_revision = "8d41b7e2c5f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_motd_live",
+            "motd",
+            ["starts_at", "ends_at"],
+            postgresql_where=sa.text("published"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_motd_published", table_name="motd", postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_motd_published", "motd", ["published"], postgresql_concurrently=True)
+        op.drop_index("ix_motd_live", table_name="motd", postgresql_concurrently=True)
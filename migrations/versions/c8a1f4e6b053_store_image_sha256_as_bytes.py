@@ -0,0 +1,35 @@
+"""Store image SHA-256 signatures as raw bytes and index them"""
+
+from alembic import op
+
+revision = "c8a1f4e6b053"
+down_revision = "5d9f0b3a7e12"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "ALTER TABLE images ALTER COLUMN signature_sha256 TYPE bytea "
+        "USING decode(signature_sha256, 'hex')"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_images_signature_sha256",
+            "images",
+            ["signature_sha256"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_images_signature_sha256",
+            table_name="images",
+            postgresql_concurrently=True,
+        )
+    op.execute(
+        "ALTER TABLE images ALTER COLUMN signature_sha256 TYPE varchar(64) "
+        "USING encode(signature_sha256, 'hex')"
+    )
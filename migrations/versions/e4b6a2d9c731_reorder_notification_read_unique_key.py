@@ -0,0 +1,53 @@
+"""Reorder notification read unique key to lead with the event time"""
+
+from alembic import op
+
+revision = "e4b6a2d9c731"
+down_revision = "a7c3e9f1d284"
+branch_labels = None
+depends_on = None
+
+NEW_KEY = ["user_id", "event_type", "event_created_at", "image_id", "actor_id"]
+OLD_KEY = ["user_id", "event_type", "image_id", "actor_id", "event_created_at"]
+
+
+def _swap_unique_constraint(columns):
+    # Build the replacement index without blocking writes, then attach it to
+    # the constraint in a single ALTER so uniqueness is never unenforced.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_notification_read_event_next",
+            "notification_reads",
+            columns,
+            unique=True,
+            postgresql_concurrently=True,
+        )
+    op.execute(
+        "ALTER TABLE notification_reads "
+        "DROP CONSTRAINT uq_notification_read_event, "
+        "ADD CONSTRAINT uq_notification_read_event "
+        "UNIQUE USING INDEX uq_notification_read_event_next"
+    )
+
+
+def upgrade():
+    _swap_unique_constraint(NEW_KEY)
+    # The reordered unique key serves (user_id, event_type, event_created_at)
+    # range scans, so the separate user/type index is redundant.
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_notification_reads_user_type",
+            table_name="notification_reads",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notification_reads_user_type",
+            "notification_reads",
+            ["user_id", "event_type"],
+            postgresql_concurrently=True,
+        )
+    _swap_unique_constraint(OLD_KEY)
@@ -0,0 +1,38 @@
+"""Cover image_id in the feed_seen (user_id, seen_at) index"""
+
+from alembic import op
+
+revision = "f3b7d1a9c625"
+down_revision = "9c4e2b7a1f38"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The seen-id lookup only reads image_id, so with it included the
+    # newest-first scan never touches the heap. (user_id, image_id) is
+    # already covered by uq_feed_seen_user_image.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_feed_seen_user_seen_image",
+            "feed_seen",
+            ["user_id", "seen_at"],
+            postgresql_include=["image_id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_feed_seen_user_seen_at", table_name="feed_seen", postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_feed_seen_user_seen_at",
+            "feed_seen",
+            ["user_id", "seen_at"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_feed_seen_user_seen_image", table_name="feed_seen", postgresql_concurrently=True
+        )
@@ -3,32 +3,35 @@ import mimetypes
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+from sqlalchemy import insert
 from werkzeug.datastructures import FileStorage
 
 from skyframe import create_app
 from skyframe.config import Config
 from skyframe.extensions import db
 from skyframe.forms import CATEGORY_CHOICES
-from skyframe.models import Image, User
+from skyframe.models import Image, User, hash_bits
 from skyframe.storage import process_image_upload
 
 FILENAME_RE = re.compile(
-    r"^(?:[A-Za-z]+)?(?P<date>\d{4}-\d{2}-\d{2})_"
-    r"(?P<time>\d{2}-\d{2}-\d{2})(?:_(?P<filter>[^_]+))?(?:_(?P<observer>.+))?$"
+    r"(?:[A-Za-z]+)?(\d{4})-(\d{2})-(\d{2})_"
+    r"(\d{2})-(\d{2})-(\d{2})(?:_([^_]+))?(?:_(.+))?"
 )
 
 
 def parse_filename(stem: str):
-    match = FILENAME_RE.match(stem)
+    match = FILENAME_RE.fullmatch(stem)
     if not match:
         return None, None, None
-    date_part = match.group("date")
-    time_part = match.group("time")
-    observed_at = datetime.strptime(f"{date_part} {time_part}", "%Y-%m-%d %H-%M-%S")
-    return observed_at, match.group("filter"), match.group("observer")
+    year, month, day, hour, minute, second, filter_value, observer = match.groups()
+    observed_at = datetime(
+        int(year), int(month), int(day), int(hour), int(minute), int(second)
+    )
+    return observed_at, filter_value, observer
 
 
 def build_parser():
@@ -74,6 +77,18 @@ def build_parser():
         action="store_true",
         help="Allow scientific reuse for all images.",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Number of images inserted per database commit (default: 500).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of images processed in parallel (default: CPU count).",
+    )
     parser.add_argument(
         "--env",
         default=os.getenv("FLASK_ENV", "default"),
@@ -83,13 +98,53 @@ def build_parser():
 
 
 def iter_images(folder: Path):
-    for path in sorted(folder.iterdir()):
-        if not path.is_file():
-            continue
-        ext = path.suffix.lower().lstrip(".")
+    # scandir's cached entry type saves a stat() per file on large folders.
+    with os.scandir(folder) as entries:
+        files = [entry for entry in entries if entry.is_file()]
+    files.sort(key=lambda entry: entry.name)
+    for entry in files:
+        ext = os.path.splitext(entry.name)[1].lower().lstrip(".")
         if ext not in Config.ALLOWED_IMAGE_EXTENSIONS:
             continue
-        yield path
+        yield Path(entry.path)
+
+
+def process_file(path: Path, owner_name: str):
+    with path.open("rb") as handle:
+        content_type, _ = mimetypes.guess_type(path.name)
+        file_storage = FileStorage(
+            stream=handle,
+            filename=path.name,
+            content_type=content_type or "application/octet-stream",
+        )
+        return process_image_upload(file_storage, owner_name)
+
+
+def flush_pending(pending):
+    if not pending:
+        return 0, 0
+    # Core insert of plain rows: one executemany per batch, no RETURNING.
+    statement = insert(Image.__table__)
+    try:
+        db.session.execute(statement, [row for _path, row in pending])
+        db.session.commit()
+        return len(pending), 0
+    except Exception:
+        db.session.rollback()
+
+    # Retry row by row so the offending file can be reported.
+    imported = 0
+    errors = 0
+    for path, row in pending:
+        try:
+            db.session.execute(statement, [row])
+            db.session.commit()
+            imported += 1
+        except Exception as exc:
+            db.session.rollback()
+            print(f"Error importing {path.name}: {exc}", file=sys.stderr)
+            errors += 1
+    return imported, errors
 
 
 def main():
@@ -101,36 +156,45 @@ def main():
         print(f"Folder not found: {folder}", file=sys.stderr)
         return 2
 
+    if args.batch_size < 1:
+        print("--batch-size must be at least 1", file=sys.stderr)
+        return 2
+    if args.workers < 1:
+        print("--workers must be at least 1", file=sys.stderr)
+        return 2
+
     app = create_app(args.env)
     imported = 0
     skipped = 0
     errors = 0
+    pending = []
 
     with app.app_context():
-        user = User.query.filter_by(username=args.username).first()
+        user = User.query.filter_by(username=args.username.lower()).first()
         if not user:
             print(f"User not found: {args.username}", file=sys.stderr)
             return 2
 
-        for path in iter_images(folder):
-            observed_at, filter_value, observer_name = parse_filename(path.stem)
-            if not observed_at:
-                print(f"Skipping (unmatched filename): {path.name}", file=sys.stderr)
-                skipped += 1
-                continue
-            if not observer_name:
-                observer_name = args.observer_name or user.username
-            if not filter_value:
-                filter_value = args.default_filter
-
-            try:
-                with path.open("rb") as handle:
-                    content_type, _ = mimetypes.guess_type(path.name)
-                    file_storage = FileStorage(
-                        stream=handle,
-                        filename=path.name,
-                        content_type=content_type or "application/octet-stream",
-                    )
+        owner_name = user.username
+        jobs = {}
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for path in iter_images(folder):
+                observed_at, filter_value, observer_name = parse_filename(path.stem)
+                if not observed_at:
+                    print(f"Skipping (unmatched filename): {path.name}", file=sys.stderr)
+                    skipped += 1
+                    continue
+                if not observer_name:
+                    observer_name = args.observer_name or owner_name
+                if not filter_value:
+                    filter_value = args.default_filter
+                future = executor.submit(process_file, path, owner_name)
+                jobs[future] = (path, observed_at, filter_value, observer_name)
+
+            # Processing runs on the pool; the session is only touched here.
+            for future in as_completed(jobs):
+                path, observed_at, filter_value, observer_name = jobs.pop(future)
+                try:
                     (
                         image_path,
                         thumb_path,
@@ -138,34 +202,45 @@ def main():
                         signature_sha256,
                         signature_phash,
                         signature_dhash,
-                    ) = process_image_upload(file_storage, user.username)
-                image = Image(
-                    user_id=user.id,
-                    file_path=image_path,
-                    thumb_path=thumb_path,
-                    category=args.category,
-                    object_name=args.object,
-                    observer_name=observer_name,
-                    observed_at=observed_at,
-                    location=args.location,
-                    filter=filter_value,
-                    telescope=args.telescope,
-                    camera=args.camera,
-                    seeing_rating=args.seeing,
-                    transparency_rating=args.transparency,
-                    allow_scientific_use=args.allow_scientific,
-                    watermark_hash=watermark_hash,
-                    signature_sha256=signature_sha256,
-                    signature_phash=signature_phash,
-                    signature_dhash=signature_dhash,
-                )
-                db.session.add(image)
-                db.session.commit()
-                imported += 1
-            except Exception as exc:
-                db.session.rollback()
-                print(f"Error importing {path.name}: {exc}", file=sys.stderr)
-                errors += 1
+                    ) = future.result()
+                except Exception as exc:
+                    print(f"Error importing {path.name}: {exc}", file=sys.stderr)
+                    errors += 1
+                    continue
+
+                row = {
+                    "user_id": user.id,
+                    "file_path": image_path,
+                    "thumb_path": thumb_path,
+                    "category": args.category,
+                    "object_name": args.object,
+                    "observer_name": observer_name,
+                    "observed_at": observed_at,
+                    "location": args.location,
+                    "filter": filter_value,
+                    "telescope": args.telescope,
+                    "camera": args.camera,
+                    "seeing_rating": args.seeing,
+                    "transparency_rating": args.transparency,
+                    "allow_scientific_use": args.allow_scientific,
+                    "watermark_hash": watermark_hash,
+                    "signature_sha256": signature_sha256,
+                    "signature_phash": signature_phash,
+                    "signature_dhash": signature_dhash,
+                    # Core inserts bypass the model validator that fills these.
+                    "signature_phash_bits": hash_bits(signature_phash),
+                    "signature_dhash_bits": hash_bits(signature_dhash),
+                }
+                pending.append((path, row))
+                if len(pending) >= args.batch_size:
+                    batch_imported, batch_errors = flush_pending(pending)
+                    imported += batch_imported
+                    errors += batch_errors
+                    pending.clear()
+
+        batch_imported, batch_errors = flush_pending(pending)
+        imported += batch_imported
+        errors += batch_errors
 
     print(
         f"Import complete. Imported: {imported}, skipped: {skipped}, errors: {errors}."
@@ -2,12 +2,18 @@
 import argparse
 from datetime import datetime
 
-from sqlalchemy import func
+from flask import current_app
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import load_only
 
-from skyframe import create_app
+from skyframe import create_minimal_app
 from skyframe.extensions import db
+from skyframe.feed import prune_seen
 from skyframe.models import Image, Motd, User
 
+# Publishing and expiring only touch the schedule, not the title or body.
+MOTD_STATE_COLUMNS = load_only(Motd.id, Motd.published, Motd.starts_at, Motd.ends_at)
+
 
 def parse_dt(value: str | None):
     if not value:
@@ -20,7 +26,7 @@ def parse_dt(value: str | None):
 
 def with_app_context(fn):
     def wrapper(*args, **kwargs):
-        app = create_app()
+        app = create_minimal_app()
         with app.app_context():
             return fn(*args, **kwargs)
 
@@ -29,10 +35,12 @@ def with_app_context(fn):
 
 @with_app_context
 def cmd_users_list(_args):
-    users = User.query.order_by(User.id.asc()).all()
-    for user in users:
-        status = "active" if user.active else "disabled"
-        print(f"{user.id}\t{user.username}\t{user.email}\t{status}")
+    rows = db.session.execute(
+        select(User.id, User.username, User.email, User.active).order_by(User.id.asc())
+    )
+    for user_id, username, email, active in rows:
+        status = "active" if active else "disabled"
+        print(f"{user_id}\t{username}\t{email}\t{status}")
 
 
 @with_app_context
@@ -49,7 +57,7 @@ def cmd_users_create(args):
 def cmd_users_disable(args):
     user = None
     if args.id:
-        user = User.query.get(args.id)
+        user = db.session.get(User, args.id, options=[load_only(User.id, User.username, User.active)])
     elif args.username:
         user = User.query.filter_by(username=args.username.lower()).first()
     if not user:
@@ -76,7 +84,7 @@ def cmd_motd_add(args):
 
 @with_app_context
 def cmd_motd_publish(args):
-    motd = Motd.query.get(args.id)
+    motd = db.session.get(Motd, args.id, options=[MOTD_STATE_COLUMNS])
     if not motd:
         print("MOTD not found")
         return
@@ -91,7 +99,7 @@ def cmd_motd_publish(args):
 
 @with_app_context
 def cmd_motd_expire(args):
-    motd = Motd.query.get(args.id)
+    motd = db.session.get(Motd, args.id, options=[MOTD_STATE_COLUMNS])
     if not motd:
         print("MOTD not found")
         return
@@ -102,9 +110,29 @@ def cmd_motd_expire(args):
 
 
 @with_app_context
-def cmd_stats(_args):
-    total_users = db.session.query(func.count(User.id)).scalar() or 0
-    total_images = db.session.query(func.count(Image.id)).scalar() or 0
+def cmd_feed_prune_seen(args):
+    days = args.days if args.days is not None else current_app.config["FEED_SEEN_RETENTION_DAYS"]
+    removed = prune_seen(days)
+    print(f"Pruned {removed} seen feed entries older than {days} days")
+
+
+def count_rows(model, exact: bool) -> int:
+    # PostgreSQL's planner estimate avoids a full heap scan; it is -1 until
+    # the table has been analyzed, so fall back to COUNT(*) in that case.
+    if not exact and db.engine.dialect.name == "postgresql":
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": model.__tablename__},
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return db.session.query(func.count(model.id)).scalar() or 0
+
+
+@with_app_context
+def cmd_stats(args):
+    total_users = count_rows(User, args.exact)
+    total_images = count_rows(Image, args.exact)
     print(f"Total users: {total_users}")
     print(f"Total images: {total_images}")
 
@@ -164,7 +192,23 @@ def build_parser():
     motd_expire.add_argument("--id", type=int, required=True)
     motd_expire.set_defaults(func=cmd_motd_expire)
 
+    feed_parser = subparsers.add_parser("feed")
+    feed_sub = feed_parser.add_subparsers(dest="feed_command", required=True)
+
+    feed_prune_seen = feed_sub.add_parser("prune-seen")
+    feed_prune_seen.add_argument(
+        "--days",
+        type=int,
+        help="Retention window in days (default: FEED_SEEN_RETENTION_DAYS)",
+    )
+    feed_prune_seen.set_defaults(func=cmd_feed_prune_seen)
+
     stats_parser = subparsers.add_parser("stats")
+    stats_parser.add_argument(
+        "--exact",
+        action="store_true",
+        help="Count rows exactly instead of using the PostgreSQL estimate",
+    )
     stats_parser.set_defaults(func=cmd_stats)
 
     return parser
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 from skyframe import create_app
@@ -12,6 +14,8 @@ from skyframe.storage import (
     sha256_file,
 )
 
+BATCH_SIZE = 50
+
 
 def build_parser():
     parser = argparse.ArgumentParser(
@@ -31,60 +35,89 @@ def build_parser():
         default=0,
         help="Process at most this many images (0 = no limit)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes used to compute signatures (default: CPU count)",
+    )
     return parser
 
 
+def compute_signatures(path_str: str) -> tuple[str, str, str]:
+    path = Path(path_str)
+    signature_phash, signature_dhash = perceptual_hashes_for_file(path)
+    return sha256_file(path), signature_phash, signature_dhash
+
+
+def iter_image_batches(limit: int):
+    last_id = 0
+    remaining = limit
+    while not limit or remaining > 0:
+        size = min(BATCH_SIZE, remaining) if limit else BATCH_SIZE
+        batch = (
+            Image.query.filter(Image.id > last_id)
+            .order_by(Image.id.asc())
+            .limit(size)
+            .all()
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+        remaining -= len(batch)
+        yield batch
+
+
 def main():
     args = build_parser().parse_args()
     app = create_app()
 
     with app.app_context():
         base_path = Path(app.config["UPLOAD_PATH"])
-        images = Image.query.order_by(Image.id.asc()).all()
         changed = 0
         scanned = 0
 
-        for image in images:
-            if args.limit and scanned >= args.limit:
-                break
-            scanned += 1
-            file_path = base_path / image.file_path
-            thumb_path = base_path / image.thumb_path
-            if not file_path.exists():
-                app.logger.warning("Missing image file for id=%s", image.id)
-                continue
-
-            updated = False
-            watermark_hash = image.watermark_hash
-            signature_sha256 = image.signature_sha256
-            signature_phash = image.signature_phash
-            signature_dhash = image.signature_dhash
-
-            apply_watermark = not args.skip_watermark and (args.force or not watermark_hash)
-            if apply_watermark:
-                watermark_hash = apply_watermark_to_file(file_path, image.uploader.username)
-                regenerate_thumbnail(file_path, thumb_path)
-                updated = True
-
-            if args.force or not signature_sha256 or not signature_phash or not signature_dhash or updated:
-                signature_sha256 = sha256_file(file_path)
-                signature_phash, signature_dhash = perceptual_hashes_for_file(file_path)
-                updated = True
-
-            if updated:
-                changed += 1
-                if not args.dry_run:
-                    image.watermark_hash = watermark_hash
-                    image.signature_sha256 = signature_sha256
-                    image.signature_phash = signature_phash
-                    image.signature_dhash = signature_dhash
-                    db.session.add(image)
+        with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+            for batch in iter_image_batches(args.limit):
+                jobs = {}
+                for image in batch:
+                    scanned += 1
+                    file_path = base_path / image.file_path
+                    thumb_path = base_path / image.thumb_path
+                    if not file_path.exists():
+                        app.logger.warning("Missing image file for id=%s", image.id)
+                        continue
+
+                    # Watermarking rewrites the file, so it stays serial.
+                    watermark_hash = image.watermark_hash
+                    apply_watermark = not args.skip_watermark and (args.force or not watermark_hash)
+                    if apply_watermark:
+                        watermark_hash = apply_watermark_to_file(file_path, image.uploader.username)
+                        regenerate_thumbnail(file_path, thumb_path)
+
+                    if (
+                        args.force
+                        or apply_watermark
+                        or not image.signature_sha256
+                        or not image.signature_phash
+                        or not image.signature_dhash
+                    ):
+                        future = executor.submit(compute_signatures, str(file_path))
+                        jobs[future] = (image, watermark_hash)
+
+                for future in as_completed(jobs):
+                    image, watermark_hash = jobs[future]
+                    signature_sha256, signature_phash, signature_dhash = future.result()
+                    changed += 1
+                    if not args.dry_run:
+                        image.watermark_hash = watermark_hash
+                        image.signature_sha256 = signature_sha256
+                        image.signature_phash = signature_phash
+                        image.signature_dhash = signature_dhash
+                        db.session.add(image)
 
-            if not args.dry_run and scanned % 50 == 0:
-                db.session.commit()
-
-        if not args.dry_run:
-            db.session.commit()
+                if not args.dry_run:
+                    db.session.commit()
 
         print(f"Scanned: {scanned}")
         print(f"Updated: {changed}")
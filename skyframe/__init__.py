@@ -21,7 +21,7 @@ configurations = {
 }
 
 
-def create_app(config_name: str | None = None):
+def _build_app(config_name: str | None):
     config_name = config_name or os.getenv("FLASK_ENV", "default")
     app = Flask(
         __name__,
@@ -32,7 +32,21 @@ def create_app(config_name: str | None = None):
     app.config.from_object(configurations.get(config_name, ProductionConfig))
     Config.init_app(app)
 
-    app.config.setdefault("JSON_SORT_KEYS", False)
+    # Flask 2.3 dropped the JSON_SORT_KEYS setting; configure the provider
+    # directly so large feed payloads are not key-sorted on every response.
+    app.json.sort_keys = False
+    return app
+
+
+def create_minimal_app(config_name: str | None = None):
+    """App with config and database only, for scripts that do not serve requests."""
+    app = _build_app(config_name)
+    db.init_app(app)
+    return app
+
+
+def create_app(config_name: str | None = None):
+    app = _build_app(config_name)
     login_manager.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
@@ -41,7 +55,20 @@ def create_app(config_name: str | None = None):
 
     @login_manager.user_loader
     def _load_user(user_id):
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
+
+    # Only the nonce changes between responses, so build the policy once.
+    csp_template = (
+        "default-src 'self'; "
+        f"script-src {Config.CSP_SCRIPT_SRC} 'nonce-{{nonce}}'; "
+        f"style-src {Config.CSP_STYLE_SRC} 'nonce-{{nonce}}'; "
+        f"img-src {Config.CSP_IMG_SRC}; "
+        f"font-src {Config.CSP_FONT_SRC}; "
+        f"connect-src {Config.CSP_CONNECT_SRC}; "
+        "object-src 'none'; "
+        "base-uri 'self'; "
+        "frame-ancestors 'none'; "
+    )
 
     @app.before_request
     def set_nonce():
@@ -50,18 +77,7 @@ def create_app(config_name: str | None = None):
     @app.after_request
     def set_security_headers(response):
         nonce = getattr(g, "csp_nonce", "")
-        csp = (
-            f"default-src 'self'; "
-            f"script-src {Config.CSP_SCRIPT_SRC} 'nonce-{nonce}'; "
-            f"style-src {Config.CSP_STYLE_SRC} 'nonce-{nonce}'; "
-            f"img-src {Config.CSP_IMG_SRC}; "
-            f"font-src {Config.CSP_FONT_SRC}; "
-            f"connect-src {Config.CSP_CONNECT_SRC}; "
-            "object-src 'none'; "
-            "base-uri 'self'; "
-            "frame-ancestors 'none'; "
-        )
-        response.headers.setdefault("Content-Security-Policy", csp)
+        response.headers.setdefault("Content-Security-Policy", csp_template.replace("{nonce}", nonce))
         response.headers.setdefault("Strict-Transport-Security", "max-age=31536000; includeSubDomains; preload")
         response.headers.setdefault("X-Content-Type-Options", "nosniff")
         response.headers.setdefault("Referrer-Policy", "no-referrer-when-downgrade")
@@ -1,12 +1,14 @@
-import hashlib
 import mimetypes
+import os
 import re
 from datetime import datetime
-from functools import wraps
+from functools import lru_cache, wraps
+from operator import attrgetter
 from pathlib import Path
 
 from flask import (
     current_app,
+    g,
     jsonify,
     request,
     send_from_directory,
@@ -16,11 +18,22 @@ from flask_login import current_user, login_required
 
 from flask_wtf.csrf import validate_csrf
 from wtforms.validators import ValidationError
-from sqlalchemy import func
+from sqlalchemy import cast, delete, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 from ..config import Config
-from ..feed import build_feed_selection, persist_seen_for_feed
+from ..feed import (
+    build_feed_selection,
+    load_user_edge_sets,
+    observed_before,
+    parse_cursor_point,
+    persist_seen_for_feed,
+)
 from ..astro import planetary_coordinates
 from ..extensions import csrf_protect, db, limiter
 from ..forms import CATEGORY_CHOICES as FORM_CATEGORY_CHOICES
@@ -35,15 +48,26 @@ from ..models import (
     MotdSeen,
     NotificationRead,
     User,
+    hash_bits,
 )
 from ..share_storage import create_share_token
-from ..storage import perceptual_hashes_for_bytes, sha256_file, winjupos_label_from_metadata
+from ..storage import (
+    perceptual_hashes_for_stream,
+    sha256_file,
+    sha256_stream,
+    winjupos_label_from_metadata,
+)
 from . import bp
 
 
-CATEGORY_CHOICES = {name for name, _ in FORM_CATEGORY_CHOICES}
+CATEGORY_CHOICES = frozenset(name for name, _ in FORM_CATEGORY_CHOICES)
 IMAGE_METADATA_SPEC = {
-    "category": {"required": True, "max_length": 64, "choices": CATEGORY_CHOICES},
+    "category": {
+        "required": True,
+        "max_length": 64,
+        "choices": CATEGORY_CHOICES,
+        "choices_label": ", ".join(sorted(CATEGORY_CHOICES)),
+    },
     "object_name": {"required": True, "max_length": 128},
     "observer_name": {"required": True, "max_length": 128},
     "location": {"required": False, "max_length": 128},
@@ -52,7 +76,9 @@ IMAGE_METADATA_SPEC = {
     "camera": {"required": False, "max_length": 128},
     "notes": {"required": False, "max_length": 512},
 }
-ALLOWED_METADATA_KEYS = set(IMAGE_METADATA_SPEC.keys()) | {"observed_at"}
+ALLOWED_METADATA_KEYS = frozenset(IMAGE_METADATA_SPEC) | {"observed_at"}
+TAG_RE = re.compile(r"#([A-Za-z0-9_\-]+)")
+TRUTHY_ARGS = frozenset({"1", "true", "yes"})
 
 
 def _parse_iso_datetime(value: str) -> datetime:
@@ -88,16 +114,76 @@ def _require_json_csrf():
 def _extract_tags(notes: str | None) -> list[str]:
     if not notes:
         return []
-    return re.findall(r"#([A-Za-z0-9_\-]+)", notes)
-
-
-def _hamming_distance(left: str | None, right: str | None) -> int | None:
-    if not left or not right:
-        return None
-    try:
-        return (int(left, 16) ^ int(right, 16)).bit_count()
-    except ValueError:
-        return None
+    return TAG_RE.findall(notes)
+
+
+_HASH_MASK = (1 << 64) - 1
+
+
+def _hamming_distance(left: int, right: int) -> int:
+    # Operands are the signed BIGINT hash copies; mask back to 64 bits.
+    return ((left ^ right) & _HASH_MASK).bit_count()
+
+
+def _pair_exists(model, **criteria) -> bool:
+    # EXISTS probe on key columns; never hydrates an ORM instance.
+    return db.session.query(db.session.query(model).filter_by(**criteria).exists()).scalar()
+
+
+def _current_user_edge_sets() -> tuple[set[int], set[int], set[int]]:
+    # Loaded once and reused for the rest of the request.
+    if not current_user.is_authenticated:
+        return set(), set(), set()
+    cached = g.get("current_user_edge_sets")
+    if cached is None:
+        cached = g.current_user_edge_sets = load_user_edge_sets(current_user.id)
+    return cached
+
+
+_URL_ID_PLACEHOLDER = 2147483647
+
+
+def _image_url(endpoint: str, image_id: int, *id_params: str, **values) -> str:
+    # url_for walks the URL map on every call; build each URL shape once per
+    # request with a placeholder id and splice real ids into the cached parts.
+    id_params = id_params or ("image_id",)
+    key = (endpoint, id_params, tuple(values.items()))
+    templates = g.setdefault("image_url_templates", {})
+    parts = templates.get(key)
+    if parts is None:
+        placeholder = dict.fromkeys(id_params, _URL_ID_PLACEHOLDER)
+        parts = url_for(endpoint, **placeholder, **values).split(str(_URL_ID_PLACEHOLDER))
+        templates[key] = parts
+    return str(image_id).join(parts)
+
+
+def _thumb_url(image: Image) -> str:
+    # The version varies per image, so it stays out of the cached URL shape.
+    return f"{_image_url('api.download_image', image.id, thumb=1)}&v={image.thumb_version}"
+
+
+# Columns copied straight into the payload, fetched with one C-level call.
+_PLAIN_IMAGE_FIELDS = (
+    "id",
+    "category",
+    "object_name",
+    "observer_name",
+    "location",
+    "telescope",
+    "camera",
+    "filter",
+    "like_count",
+    "favorite_count",
+    "comment_count",
+    "derotation_time",
+    "seeing_rating",
+    "transparency_rating",
+    "bortle_rating",
+    "max_exposure_time",
+    "allow_scientific_use",
+    "watermark_hash",
+)
+_get_plain_image_fields = attrgetter(*_PLAIN_IMAGE_FIELDS)
 
 
 def _serialize_image(
@@ -107,47 +193,30 @@ def _serialize_image(
     following_ids: set[int],
     current_user_id: int | None,
 ) -> dict:
-    return {
-        "id": image.id,
-        "category": image.category,
-        "object_name": image.object_name,
-        "observer_name": image.observer_name,
-        "observed_at": image.observed_at.isoformat(),
-        "location": image.location,
-        "telescope": image.telescope,
-        "camera": image.camera,
-        "filter": image.filter,
-        "notes": image.notes or "",
-        "created_at": image.created_at.isoformat(),
-        "uploader": image.uploader.username,
-        "uploader_id": image.uploader.id,
-        "owned_by_current_user": current_user_id is not None and image.user_id == current_user_id,
-        "like_count": image.likes.count(),
-        "favorite_count": image.favorites.count(),
-        "comment_count": image.comments.count(),
-        "liked": image.id in liked_ids,
-        "favorited": image.id in favorited_ids,
-        "following_uploader": image.uploader.id in following_ids,
-        "thumb_url": url_for("api.download_image", image_id=image.id, thumb=1),
-        "download_url": url_for("api.download_image", image_id=image.id),
-        "download_name": f"{winjupos_label_from_metadata(image.object_name, image.observed_at, image.filter, image.uploader.username)}.jpg",
-        "tags": _extract_tags(image.notes),
-        "derotation_time": getattr(image, "derotation_time", None),
-        "planetary_data": planetary_coordinates(
-            image.observed_at,
-            image.object_name,
-            image.uploader.observatory_latitude,
-            image.uploader.observatory_longitude,
-        )
-        if image.category == "Planets"
+    data = dict(zip(_PLAIN_IMAGE_FIELDS, _get_plain_image_fields(image)))
+    image_id = data["id"]
+    uploader = image.uploader
+    observed_at = image.observed_at
+    notes = image.notes
+    data.update(
+        observed_at=observed_at.isoformat(),
+        notes=notes or "",
+        created_at=image.created_at.isoformat(),
+        uploader=uploader.username,
+        uploader_id=uploader.id,
+        owned_by_current_user=current_user_id is not None and image.user_id == current_user_id,
+        liked=image_id in liked_ids,
+        favorited=image_id in favorited_ids,
+        following_uploader=uploader.id in following_ids,
+        thumb_url=_thumb_url(image),
+        download_url=_image_url("api.download_image", image_id),
+        download_name=f"{winjupos_label_from_metadata(data['object_name'], observed_at, data['filter'], uploader.username)}.jpg",
+        tags=_extract_tags(notes),
+        planetary_data_url=_image_url("api.planetary_for_image", image_id)
+        if data["category"] == "Planets"
         else None,
-        "seeing_rating": image.seeing_rating,
-        "transparency_rating": image.transparency_rating,
-        "bortle_rating": image.bortle_rating,
-        "max_exposure_time": image.max_exposure_time,
-        "allow_scientific_use": image.allow_scientific_use,
-        "watermark_hash": image.watermark_hash,
-    }
+    )
+    return data
 
 
 @bp.route("/images/<int:image_id>/share", methods=["POST"])
@@ -163,6 +232,33 @@ def share_image(image_id):
     return jsonify({"share_url": share_url})
 
 
+@bp.route("/images/<int:image_id>/planetary", methods=["GET"])
+def planetary_for_image(image_id):
+    row = (
+        db.session.query(
+            Image.category,
+            Image.observed_at,
+            Image.object_name,
+            User.observatory_latitude,
+            User.observatory_longitude,
+        )
+        .join(User, User.id == Image.user_id)
+        .filter(Image.id == image_id)
+        .first()
+    )
+    if row is None:
+        return jsonify({"error": "not found"}), 404
+    planetary_data = None
+    if row.category == "Planets":
+        planetary_data = planetary_coordinates(
+            row.observed_at,
+            row.object_name,
+            row.observatory_latitude,
+            row.observatory_longitude,
+        )
+    return jsonify({"planetary_data": planetary_data})
+
+
 @bp.route("/images/<int:image_id>/verify", methods=["GET"])
 def verify_image(image_id):
     image = Image.query.get_or_404(image_id)
@@ -200,21 +296,108 @@ def verify_image(image_id):
     )
 
 
+_SIMILAR_IMAGE_COLUMNS = (
+    Image.id,
+    Image.object_name,
+    Image.observer_name,
+    Image.category,
+    Image.observed_at,
+    Image.telescope,
+    Image.camera,
+    Image.filter,
+    Image.location,
+    Image.allow_scientific_use,
+    User.username,
+)
+
+
+def _find_similar_image(phash_value: str, dhash_value: str, max_phash: int, max_dhash: int):
+    dialect = db.engine.dialect
+    # bit_count() on bit strings arrived in PostgreSQL 14; older servers take
+    # the Python scan below.
+    if dialect.name == "postgresql" and (dialect.server_version_info or ()) >= (14,):
+        # Let PostgreSQL XOR and popcount the hashes so only the best match
+        # is transferred.
+        phash_distance = func.bit_count(
+            cast(Image.signature_phash_bits.op("#")(hash_bits(phash_value)), BIT(64))
+        )
+        dhash_distance = func.bit_count(
+            cast(Image.signature_dhash_bits.op("#")(hash_bits(dhash_value)), BIT(64))
+        )
+        row = (
+            db.session.query(
+                *_SIMILAR_IMAGE_COLUMNS,
+                phash_distance.label("phash_distance"),
+                dhash_distance.label("dhash_distance"),
+            )
+            .join(User, User.id == Image.user_id)
+            .filter(phash_distance <= max_phash, dhash_distance <= max_dhash)
+            .order_by((phash_distance + dhash_distance).asc(), Image.id.asc())
+            .first()
+        )
+        if row is None:
+            return None
+        return row, row.phash_distance, row.dhash_distance
+
+    query_phash = hash_bits(phash_value)
+    query_dhash = hash_bits(dhash_value)
+    if query_phash is None or query_dhash is None:
+        return None
+    # Scan only the narrow (id, hash) tuples and fetch the display columns
+    # for the winning image alone.
+    candidates = db.session.execute(
+        select(Image.id, Image.signature_phash_bits, Image.signature_dhash_bits)
+        .where(Image.signature_phash_bits.isnot(None), Image.signature_dhash_bits.isnot(None))
+        .order_by(Image.id.asc())
+    )
+    best = None
+    best_score = None
+    for image_id, phash_bits, dhash_bits in candidates:
+        phash_dist = _hamming_distance(query_phash, phash_bits)
+        if phash_dist > max_phash:
+            continue
+        dhash_dist = _hamming_distance(query_dhash, dhash_bits)
+        if dhash_dist > max_dhash:
+            continue
+        score = phash_dist + dhash_dist
+        if best_score is None or score < best_score:
+            best_score = score
+            best = (image_id, phash_dist, dhash_dist)
+    if best is None:
+        return None
+    image_id, phash_dist, dhash_dist = best
+    row = (
+        db.session.query(*_SIMILAR_IMAGE_COLUMNS)
+        .join(User, User.id == Image.user_id)
+        .filter(Image.id == image_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return row, phash_dist, dhash_dist
+
+
 @bp.route("/verify-file", methods=["POST"])
 @csrf_protect.exempt
 @limiter.limit("20 per minute")
 def verify_file():
-    if request.content_length and request.content_length > current_app.config["VERIFY_MAX_BYTES"]:
+    max_bytes = current_app.config["VERIFY_MAX_BYTES"]
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify({"error": "file too large"}), 413
+    # Chunked uploads carry no Content-Length; lower the request limit so the
+    # form parser stops reading as soon as the body crosses it.
+    request.max_content_length = max_bytes
+    try:
+        file_storage = request.files.get("file")
+    except RequestEntityTooLarge:
         return jsonify({"error": "file too large"}), 413
-    file_storage = request.files.get("file")
     if not file_storage or not file_storage.filename:
         return jsonify({"error": "missing file"}), 400
-    file_storage.stream.seek(0)
-    data = file_storage.stream.read()
-    file_storage.stream.seek(0)
-    computed_hash = hashlib.sha256(data).hexdigest()
+    # Hash and decode straight from the upload stream instead of copying the
+    # whole file into memory first.
+    computed_hash = sha256_stream(file_storage.stream)
     try:
-        phash_value, dhash_value = perceptual_hashes_for_bytes(data)
+        phash_value, dhash_value = perceptual_hashes_for_stream(file_storage.stream)
     except Exception:
         return jsonify({"error": "invalid image file"}), 400
     image = Image.query.filter_by(signature_sha256=computed_hash).first()
@@ -231,40 +414,9 @@ def verify_file():
                     "computed_hash": computed_hash,
                 }
             ), 200
-        candidates = (
-            db.session.query(
-                Image.id,
-                Image.signature_phash,
-                Image.signature_dhash,
-                Image.object_name,
-                Image.observer_name,
-                Image.category,
-                Image.observed_at,
-                Image.telescope,
-                Image.camera,
-                Image.filter,
-                Image.location,
-                Image.allow_scientific_use,
-                User.username,
-            )
-            .join(User, User.id == Image.user_id)
-            .filter(Image.signature_phash.isnot(None), Image.signature_dhash.isnot(None))
-            .all()
-        )
-        best = None
-        best_score = None
         max_phash = current_app.config["VERIFY_PHASH_MAX_DISTANCE"]
         max_dhash = current_app.config["VERIFY_DHASH_MAX_DISTANCE"]
-        for row in candidates:
-            phash_dist = _hamming_distance(phash_value, row.signature_phash)
-            dhash_dist = _hamming_distance(dhash_value, row.signature_dhash)
-            if phash_dist is None or dhash_dist is None:
-                continue
-            if phash_dist <= max_phash and dhash_dist <= max_dhash:
-                score = phash_dist + dhash_dist
-                if best_score is None or score < best_score:
-                    best_score = score
-                    best = (row, phash_dist, dhash_dist)
+        best = _find_similar_image(phash_value, dhash_value, max_phash, max_dhash)
         if not best:
             return jsonify(
                 {
@@ -321,60 +473,56 @@ def verify_file():
 @login_required
 def notifications():
     last_read = current_user.notifications_last_read_at or datetime.fromtimestamp(0)
-    like_total = (
-        db.session.query(func.count(Like.user_id))
-        .join(Image, Like.image_id == Image.id)
-        .filter(Image.user_id == current_user.id)
-        .scalar()
-        or 0
+    # All four badge counts come from one aggregate over both event sources.
+    user_id = current_user.id
+    like_read = (
+        (NotificationRead.user_id == user_id)
+        & (NotificationRead.event_type == "like")
+        & (NotificationRead.image_id == Like.image_id)
+        & (NotificationRead.actor_id == Like.user_id)
+        & (NotificationRead.event_created_at == Like.created_at)
     )
-    comment_total = (
-        db.session.query(func.count(Comment.id))
-        .join(Image, Comment.image_id == Image.id)
-        .filter(Image.user_id == current_user.id)
-        .scalar()
-        or 0
+    comment_read = (
+        (NotificationRead.user_id == user_id)
+        & (NotificationRead.event_type == "comment")
+        & (NotificationRead.image_id == Comment.image_id)
+        & (NotificationRead.actor_id == Comment.user_id)
+        & (NotificationRead.event_created_at == Comment.created_at)
     )
-    like_unread = (
-        db.session.query(func.count(Like.user_id))
-        .join(Image, Like.image_id == Image.id)
-        .outerjoin(
-            NotificationRead,
-            (NotificationRead.user_id == current_user.id)
-            & (NotificationRead.event_type == "like")
-            & (NotificationRead.image_id == Like.image_id)
-            & (NotificationRead.actor_id == Like.user_id)
-            & (NotificationRead.event_created_at == Like.created_at),
+    events = union_all(
+        select(
+            literal("like").label("source"),
+            (
+                (Like.user_id != user_id)
+                & (Like.created_at > last_read)
+                & NotificationRead.id.is_(None)
+            ).label("unread"),
         )
-        .filter(
-            Image.user_id == current_user.id,
-            Like.user_id != current_user.id,
-            Like.created_at > last_read,
-            NotificationRead.id.is_(None),
+        .select_from(Like)
+        .join(Image, Like.image_id == Image.id)
+        .outerjoin(NotificationRead, like_read)
+        .where(Image.user_id == user_id),
+        select(
+            literal("comment").label("source"),
+            (
+                (Comment.user_id != user_id)
+                & (Comment.created_at > last_read)
+                & NotificationRead.id.is_(None)
+            ).label("unread"),
         )
-        .scalar()
-        or 0
-    )
-    comment_unread = (
-        db.session.query(func.count(Comment.id))
+        .select_from(Comment)
         .join(Image, Comment.image_id == Image.id)
-        .outerjoin(
-            NotificationRead,
-            (NotificationRead.user_id == current_user.id)
-            & (NotificationRead.event_type == "comment")
-            & (NotificationRead.image_id == Comment.image_id)
-            & (NotificationRead.actor_id == Comment.user_id)
-            & (NotificationRead.event_created_at == Comment.created_at),
+        .outerjoin(NotificationRead, comment_read)
+        .where(Image.user_id == user_id),
+    ).subquery()
+    like_total, comment_total, like_unread, comment_unread = db.session.execute(
+        select(
+            func.count().filter(events.c.source == "like"),
+            func.count().filter(events.c.source == "comment"),
+            func.count().filter((events.c.source == "like") & events.c.unread),
+            func.count().filter((events.c.source == "comment") & events.c.unread),
         )
-        .filter(
-            Image.user_id == current_user.id,
-            Comment.user_id != current_user.id,
-            Comment.created_at > last_read,
-            NotificationRead.id.is_(None),
-        )
-        .scalar()
-        or 0
-    )
+    ).one()
     likes = (
         db.session.query(Like, Image, User)
         .join(Image, Like.image_id == Image.id)
@@ -423,12 +571,12 @@ def notifications():
         {
             "image_id": image.id,
             "image_name": image.object_name,
-            "thumb_url": url_for("api.download_image", image_id=image.id, thumb=1),
+            "thumb_url": _thumb_url(image),
             "actor": user.username,
             "actor_id": user.id,
             "actor_avatar": user.avatar_url,
             "created_at": like.created_at.isoformat(),
-            "link": url_for("main.feed", focus_image=image.id),
+            "link": _image_url("main.feed", image.id, "focus_image"),
         }
         for like, image, user in likes
     ]
@@ -436,13 +584,13 @@ def notifications():
         {
             "image_id": image.id,
             "image_name": image.object_name,
-            "thumb_url": url_for("api.download_image", image_id=image.id, thumb=1),
+            "thumb_url": _thumb_url(image),
             "actor": user.username,
             "actor_id": user.id,
             "actor_avatar": user.avatar_url,
             "body": comment.body,
             "created_at": comment.created_at.isoformat(),
-            "link": url_for("main.feed", open_comment=image.id, focus_image=image.id),
+            "link": _image_url("main.feed", image.id, "open_comment", "focus_image"),
         }
         for comment, image, user in comments
     ]
@@ -484,14 +632,15 @@ def notifications_read_item():
         parsed = datetime.fromisoformat(event_created_at)
     except ValueError:
         return jsonify({"error": "invalid event_created_at"}), 400
-    exists = NotificationRead.query.filter_by(
+    already_read = _pair_exists(
+        NotificationRead,
         user_id=current_user.id,
         event_type=event_type,
         image_id=int(image_id),
         actor_id=int(actor_id),
         event_created_at=parsed,
-    ).first()
-    if not exists:
+    )
+    if not already_read:
         db.session.add(
             NotificationRead(
                 user_id=current_user.id,
@@ -527,17 +676,7 @@ def motd_ack():
 def feed():
     cursor = request.args.get("cursor")
     per_page = current_app.config["FEED_PAGE_SIZE"]
-    liked_ids: set[int] = set()
-    favorited_ids: set[int] = set()
-    following_ids: set[int] = set()
-    if current_user.is_authenticated:
-        liked_ids = {row.image_id for row in current_user.likes.with_entities(Like.image_id).all()}
-        favorited_ids = {
-            row.image_id for row in current_user.favorites.with_entities(Favorite.image_id).all()
-        }
-        following_ids = {
-            row.followed_id for row in current_user.following.with_entities(Follow.followed_id).all()
-        }
+    liked_ids, favorited_ids, following_ids = _current_user_edge_sets()
 
     selection = build_feed_selection(
         liked_ids=liked_ids,
@@ -554,7 +693,11 @@ def feed():
     current_user_id = getattr(current_user, "id", None)
     payload = [
         _serialize_image(
-            image, liked_ids, favorited_ids, following_ids, current_user_id=current_user_id
+            image,
+            liked_ids,
+            favorited_ids,
+            following_ids,
+            current_user_id=current_user_id,
         )
         for image in selection.images
     ]
@@ -571,30 +714,15 @@ def feed():
 def my_feed():
     cursor = request.args.get("cursor")
     per_page = current_app.config["FEED_PAGE_SIZE"]
-    liked_ids = {row.image_id for row in current_user.likes.with_entities(Like.image_id).all()}
-    favorited_ids = {
-        row.image_id for row in current_user.favorites.with_entities(Favorite.image_id).all()
-    }
-    following_ids = {
-        row.followed_id for row in current_user.following.with_entities(Follow.followed_id).all()
-    }
-
-    cursor_point = None
-    cursor_image_id = None
-    if cursor:
-        try:
-            timestamp, image_id = cursor.split("_")
-            cursor_point = datetime.fromisoformat(timestamp)
-            cursor_image_id = int(image_id)
-        except ValueError:
-            return jsonify({"error": "invalid cursor"}), 400
+    liked_ids, favorited_ids, following_ids = _current_user_edge_sets()
+
+    cursor_point, cursor_image_id = parse_cursor_point(cursor)
+    if cursor and cursor_point is None:
+        return jsonify({"error": "invalid cursor"}), 400
 
     query = Image.query.filter_by(user_id=current_user.id)
     if cursor_point:
-        query = query.filter(
-            (Image.observed_at < cursor_point)
-            | ((Image.observed_at == cursor_point) & (Image.id < cursor_image_id))
-        )
+        query = query.filter(observed_before(cursor_point, cursor_image_id))
 
     ordered = (
         query.order_by(Image.observed_at.desc(), Image.id.desc())
@@ -608,7 +736,13 @@ def my_feed():
         next_cursor = f"{cursor_target.observed_at.isoformat()}_{cursor_target.id}"
 
     payload = [
-        _serialize_image(image, liked_ids, favorited_ids, following_ids, current_user_id=current_user.id)
+        _serialize_image(
+            image,
+            liked_ids,
+            favorited_ids,
+            following_ids,
+            current_user_id=current_user.id,
+        )
         for image in images
     ]
     return jsonify({"images": payload, "next_cursor": next_cursor}), 200
@@ -645,15 +779,9 @@ def search():
     if notes_query:
         query = query.filter(Image.notes.ilike(f"%{notes_query}%"))
 
-    cursor_point = None
-    cursor_image_id = None
-    if cursor:
-        try:
-            timestamp, image_id = cursor.split("_")
-            cursor_point = datetime.fromisoformat(timestamp)
-            cursor_image_id = int(image_id)
-        except ValueError:
-            return jsonify({"error": "invalid cursor"}), 400
+    cursor_point, cursor_image_id = parse_cursor_point(cursor)
+    if cursor and cursor_point is None:
+        return jsonify({"error": "invalid cursor"}), 400
 
     if cursor_point:
         query = query.filter(
@@ -662,7 +790,8 @@ def search():
         )
 
     ordered = (
-        query.order_by(Image.created_at.desc(), Image.id.desc())
+        query.options(selectinload(Image.uploader))
+        .order_by(Image.created_at.desc(), Image.id.desc())
         .limit(per_page + 1)
         .all()
     )
@@ -672,21 +801,15 @@ def search():
         cursor_target = images[-1]
         next_cursor = f"{cursor_target.created_at.isoformat()}_{cursor_target.id}"
 
-    liked_ids: set[int] = set()
-    favorited_ids: set[int] = set()
-    following_ids: set[int] = set()
-    if current_user.is_authenticated:
-        liked_ids = {row.image_id for row in current_user.likes.with_entities(Like.image_id).all()}
-        favorited_ids = {
-            row.image_id for row in current_user.favorites.with_entities(Favorite.image_id).all()
-        }
-        following_ids = {
-            row.followed_id for row in current_user.following.with_entities(Follow.followed_id).all()
-        }
+    liked_ids, favorited_ids, following_ids = _current_user_edge_sets()
     current_user_id = getattr(current_user, "id", None)
     payload = [
         _serialize_image(
-            image, liked_ids, favorited_ids, following_ids, current_user_id=current_user_id
+            image,
+            liked_ids,
+            favorited_ids,
+            following_ids,
+            current_user_id=current_user_id,
         )
         for image in images
     ]
@@ -710,16 +833,79 @@ def observer_suggestions():
     return jsonify({"observers": observers})
 
 
+def _insert_ignore(model, **values) -> int:
+    # INSERT ... ON CONFLICT DO NOTHING where the dialect supports it; returns
+    # the number of rows actually added.
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        stmt = pg_insert(model)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(model)
+    else:
+        key = {column.name: values[column.name] for column in model.__table__.primary_key}
+        if _pair_exists(model, **key):
+            return 0
+        db.session.add(model(**values))
+        db.session.flush()
+        return 1
+    return db.session.execute(stmt.values(**values).on_conflict_do_nothing()).rowcount
+
+
+_EDGE_COUNTERS = {Like: Image.like_count, Favorite: Image.favorite_count}
+
+
+def _set_image_edge(model, image_id: int, present: bool) -> int:
+    # Add or remove the current user's Like/Favorite row, move the image's
+    # counter by the rows actually changed and return the new count.
+    user_id = current_user.id
+    counter = _EDGE_COUNTERS[model]
+    bump_counter = (
+        update(Image)
+        .where(Image.id == image_id)
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.name == "postgresql":
+        # One statement: the data-modifying CTE makes the change and the
+        # counter update adds however many rows it touched.
+        if present:
+            change = (
+                pg_insert(model)
+                .values(user_id=user_id, image_id=image_id, created_at=datetime.utcnow())
+                .on_conflict_do_nothing()
+            )
+        else:
+            change = delete(model).where(model.user_id == user_id, model.image_id == image_id)
+        changed = change.returning(literal(1)).cte("changed")
+        delta = select(func.count()).select_from(changed).scalar_subquery()
+        count = db.session.execute(
+            bump_counter.add_cte(changed)
+            .values({counter: counter + (delta if present else -delta)})
+            .returning(counter)
+        ).scalar_one()
+        db.session.commit()
+        return count
+
+    if present:
+        changed = _insert_ignore(
+            model, user_id=user_id, image_id=image_id, created_at=datetime.utcnow()
+        )
+    else:
+        changed = -db.session.execute(
+            delete(model).where(model.user_id == user_id, model.image_id == image_id)
+        ).rowcount
+    if changed:
+        db.session.execute(bump_counter.values({counter: counter + changed}))
+        db.session.commit()
+    return db.session.scalar(select(counter).where(Image.id == image_id))
+
+
 @bp.route("/images/<int:image_id>/like", methods=["POST"])
 @login_required
 @limiter.limit("20 per minute")
 @json_csrf_protected
 def like_image(image_id):
     image = Image.query.get_or_404(image_id)
-    if not Like.query.get((current_user.id, image.id)):
-        db.session.add(Like(user_id=current_user.id, image_id=image.id))
-        db.session.commit()
-    return jsonify({"like_count": image.likes.count(), "liked": True})
+    return jsonify({"like_count": _set_image_edge(Like, image.id, True), "liked": True})
 
 
 @bp.route("/images/<int:image_id>/unlike", methods=["POST"])
@@ -728,11 +914,7 @@ def like_image(image_id):
 @json_csrf_protected
 def unlike_image(image_id):
     image = Image.query.get_or_404(image_id)
-    like = Like.query.get((current_user.id, image.id))
-    if like:
-        db.session.delete(like)
-        db.session.commit()
-    return jsonify({"like_count": image.likes.count(), "liked": False})
+    return jsonify({"like_count": _set_image_edge(Like, image.id, False), "liked": False})
 
 
 @bp.route("/images/<int:image_id>/favorite", methods=["POST"])
@@ -741,10 +923,7 @@ def unlike_image(image_id):
 @json_csrf_protected
 def favorite_image(image_id):
     image = Image.query.get_or_404(image_id)
-    if not Favorite.query.get((current_user.id, image.id)):
-        db.session.add(Favorite(user_id=current_user.id, image_id=image.id))
-        db.session.commit()
-    return jsonify({"favorite_count": image.favorites.count(), "favorited": True})
+    return jsonify({"favorite_count": _set_image_edge(Favorite, image.id, True), "favorited": True})
 
 
 @bp.route("/images/<int:image_id>/unfavorite", methods=["POST"])
@@ -753,11 +932,7 @@ def favorite_image(image_id):
 @json_csrf_protected
 def unfavorite_image(image_id):
     image = Image.query.get_or_404(image_id)
-    favorite = Favorite.query.get((current_user.id, image.id))
-    if favorite:
-        db.session.delete(favorite)
-        db.session.commit()
-    return jsonify({"favorite_count": image.favorites.count(), "favorited": False})
+    return jsonify({"favorite_count": _set_image_edge(Favorite, image.id, False), "favorited": False})
 
 
 @bp.route("/users/<int:user_id>/follow", methods=["POST"])
@@ -768,8 +943,13 @@ def follow_user(user_id):
     if user_id == current_user.id:
         return jsonify({"error": "cannot follow yourself"}), 400
     target = User.query.get_or_404(user_id)
-    if not Follow.query.get((current_user.id, target.id)):
-        db.session.add(Follow(follower_id=current_user.id, followed_id=target.id))
+    added = _insert_ignore(
+        Follow,
+        follower_id=current_user.id,
+        followed_id=target.id,
+        created_at=datetime.utcnow(),
+    )
+    if added:
         db.session.commit()
     return jsonify({"following": True})
 
@@ -780,9 +960,12 @@ def follow_user(user_id):
 @json_csrf_protected
 def unfollow_user(user_id):
     target = User.query.get_or_404(user_id)
-    follow = Follow.query.get((current_user.id, target.id))
-    if follow:
-        db.session.delete(follow)
+    removed = db.session.execute(
+        delete(Follow).where(
+            Follow.follower_id == current_user.id, Follow.followed_id == target.id
+        )
+    ).rowcount
+    if removed:
         db.session.commit()
     return jsonify({"following": False})
 
@@ -799,6 +982,12 @@ def add_comment(image_id):
     image = Image.query.get_or_404(image_id)
     comment = Comment(image_id=image.id, user_id=current_user.id, body=body)
     db.session.add(comment)
+    db.session.execute(
+        update(Image)
+        .where(Image.id == image.id)
+        .values(comment_count=Image.comment_count + 1)
+        .execution_options(synchronize_session=False)
+    )
     db.session.commit()
     return jsonify(
         {
@@ -815,7 +1004,8 @@ def add_comment(image_id):
 def list_comments(image_id):
     image = Image.query.get_or_404(image_id)
     comments = (
-        Comment.query.filter_by(image_id=image.id)
+        Comment.query.options(selectinload(Comment.user))
+        .filter_by(image_id=image.id)
         .order_by(Comment.created_at.asc())
         .limit(50)
         .all()
@@ -863,8 +1053,10 @@ def update_image(image_id):
     payload = request.get_json(force=True, silent=True) or {}
     if not payload:
         return jsonify({"error": "missing payload"}), 400
+    if not isinstance(payload, dict):
+        return jsonify({"error": "payload must be an object"}), 400
 
-    unknown_fields = set(payload) - ALLOWED_METADATA_KEYS
+    unknown_fields = payload.keys() - ALLOWED_METADATA_KEYS
     if unknown_fields:
         return jsonify({"error": f"unsupported fields: {', '.join(sorted(unknown_fields))}"}), 400
 
@@ -884,9 +1076,9 @@ def update_image(image_id):
             image.observed_at = parsed
             changes["observed_at"] = parsed.isoformat()
 
-    for field, spec in IMAGE_METADATA_SPEC.items():
-        if field not in payload:
-            continue
+    # Patches usually touch one or two fields; skip the rest of the spec.
+    for field in [name for name in IMAGE_METADATA_SPEC if name in payload]:
+        spec = IMAGE_METADATA_SPEC[field]
         raw_value = payload[field]
         if raw_value is None:
             setattr(image, field, None)
@@ -902,7 +1094,7 @@ def update_image(image_id):
             return jsonify({"error": f"{field} must be {max_length} characters or fewer"}), 400
         choices = spec.get("choices")
         if choices and value not in choices:
-            return jsonify({"error": f"{field} must be one of {', '.join(sorted(choices))}"}), 400
+            return jsonify({"error": f"{field} must be one of {spec['choices_label']}"}), 400
         if getattr(image, field) != value:
             setattr(image, field, value)
             changes[field] = value
@@ -936,43 +1128,79 @@ def delete_image(image_id):
     if image.user_id != current_user.id:
         return jsonify({"error": "forbidden"}), 403
 
-    base_path = Path(Config.UPLOAD_PATH)
-    for attr in ("file_path", "thumb_path"):
-        target = base_path / getattr(image, attr)
+    stored_files = (image.file_path, image.thumb_path)
+    # Bulk DELETEs instead of letting the ORM cascade load every like,
+    # favorite and comment row just to delete them one at a time.
+    for model in (Like, Favorite, Comment, FeedSeen, NotificationRead):
+        model.query.filter_by(image_id=image.id).delete(synchronize_session=False)
+    Image.query.filter_by(id=image.id).delete(synchronize_session=False)
+    db.session.commit()
+
+    upload_root = os.fspath(Config.UPLOAD_PATH)
+    for relative_path in stored_files:
         try:
-            target.unlink()
+            os.unlink(os.path.join(upload_root, relative_path))
         except FileNotFoundError:
             pass
-
-    FeedSeen.query.filter_by(image_id=image.id).delete(synchronize_session=False)
-    NotificationRead.query.filter_by(image_id=image.id).delete(synchronize_session=False)
-    db.session.delete(image)
-    db.session.commit()
     return jsonify({"deleted": True}), 200
 
 
+@lru_cache(maxsize=64)
+def _mime_type_for_suffix(suffix: str) -> str:
+    # Stored files only ever carry a handful of extensions.
+    mime_type, _ = mimetypes.guess_type(f"file{suffix}")
+    return mime_type or "application/octet-stream"
+
+
+def _set_thumb_cache_headers(response, etag: str):
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
 @bp.route("/images/<int:image_id>/download", methods=["GET"])
 @limiter.exempt
 def download_image(image_id):
     image = Image.query.get_or_404(image_id)
     base_path = Path(Config.UPLOAD_PATH)
-    thumb_requested = request.args.get("thumb", "").lower() in {"1", "true", "yes"}
+    thumb = request.args.get("thumb")
+    # _image_url emits thumb=1 and full downloads omit it, so both common
+    # cases skip the lowercasing.
+    thumb_requested = thumb is not None and (thumb == "1" or thumb.lower() in TRUTHY_ARGS)
     if not thumb_requested and not current_user.is_authenticated:
         return current_app.login_manager.unauthorized()
+    if thumb_requested:
+        # Thumb URLs carry thumb_version, so a regenerated thumbnail gets a new
+        # URL and the immutable caching below stays correct.
+        etag = f"thumb-{image.id}-{image.thumb_version}"
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+            return _set_thumb_cache_headers(response, etag)
     target = image.thumb_path if thumb_requested else image.file_path
     file_path = base_path / target
     if not file_path.exists():
         return jsonify({"error": "file missing"}), 404
-    mime_type, _ = mimetypes.guess_type(str(file_path))
-    mime_type = mime_type or "application/octet-stream"
-    label = winjupos_label_from_metadata(
-        image.object_name, image.observed_at, image.filter, image.uploader.username
-    )
-    safe_name = f"{label}.jpg"
-    return send_from_directory(
-        directory=str(base_path),
-        path=str(target),
-        as_attachment=not thumb_requested,
-        download_name=None if thumb_requested else safe_name,
-        mimetype=mime_type,
-    )
+    mime_type = _mime_type_for_suffix(file_path.suffix.lower())
+    safe_name = None
+    if not thumb_requested:
+        label = winjupos_label_from_metadata(
+            image.object_name, image.observed_at, image.filter, image.uploader.username
+        )
+        safe_name = f"{label}.jpg"
+    accel_prefix = current_app.config["X_ACCEL_REDIRECT_PREFIX"]
+    if accel_prefix:
+        response = current_app.response_class(mimetype=mime_type)
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{Path(target).as_posix()}"
+        if safe_name:
+            response.headers.set("Content-Disposition", "attachment", filename=safe_name)
+    else:
+        response = send_from_directory(
+            directory=str(base_path),
+            path=str(target),
+            as_attachment=not thumb_requested,
+            download_name=safe_name,
+            mimetype=mime_type,
+        )
+    if thumb_requested:
+        _set_thumb_cache_headers(response, etag)
+    return response
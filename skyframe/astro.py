@@ -1,119 +1,160 @@
 import math
 from datetime import datetime, timezone
+from functools import lru_cache
 
 EPOCH = datetime(2000, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+# Obliquity of the ecliptic (J2000) and its trig values, fixed per process.
+ECLIPTIC_OBLIQUITY = 23.439281 * math.pi / 180
+_SIN_ECL = math.sin(ECLIPTIC_OBLIQUITY)
+_COS_ECL = math.cos(ECLIPTIC_OBLIQUITY)
 
 
 def _mod2pi(angle: float) -> float:
-    two_pi = 2 * math.pi
-    return angle % two_pi
+    return angle % math.tau
 
 
 def _true_anomaly(M: float, e: float) -> float:
     E = M + e * math.sin(M) * (1 + e * math.cos(M))
     V = 2 * math.atan(math.sqrt((1 + e) / (1 - e)) * math.tan(0.5 * E))
     if V < 0:
-        V += 2 * math.pi
+        V += math.tau
     return V
 
 
+# J2000 orbital elements per body with their per-century rates: inclination,
+# longitude of ascending node, longitude of perihelion and mean longitude in
+# degrees + arcseconds/century; semi-major axis (AU) and eccentricity linear.
+_ORBITAL_ELEMENTS = {
+    "Sun": (
+        (0.00005, -46.94),
+        (-11.26064, -18228.25),
+        (102.94719, 1198.28),
+        (1.00000011, -0.00000005),
+        (0.01671022, -0.00003804),
+        (100.46435, 129597740.63),
+    ),
+    "Mercury": (
+        (7.00487, -23.51),
+        (48.33167, -446.3),
+        (77.45645, 573.57),
+        (0.38709893, 0.00000066),
+        (0.20563069, 0.00002527),
+        (252.25084, 538101628.29),
+    ),
+    "Venus": (
+        (3.39471, -2.86),
+        (76.68069, -996.89),
+        (131.53298, -108.8),
+        (0.72333199, 0.00000092),
+        (0.00677323, -0.00004938),
+        (181.97973, 210664136.06),
+    ),
+    "Mars": (
+        (1.85061, -25.47),
+        (49.57854, -1020.19),
+        (336.04084, 1560.78),
+        (1.52366231, -0.00007221),
+        (0.09341233, 0.00011902),
+        (355.45332, 68905103.78),
+    ),
+    "Jupiter": (
+        (1.30530, -4.15),
+        (100.55615, 1217.17),
+        (14.75385, 839.93),
+        (5.20336301, 0.00060737),
+        (0.04839266, -0.00012880),
+        (34.40438, 10925078.35),
+    ),
+    "Saturn": (
+        (2.48446, 6.11),
+        (113.71504, -1591.05),
+        (92.43194, -1948.89),
+        (9.53707032, -0.00301530),
+        (0.05415060, -0.00036762),
+        (49.94432, 4401052.95),
+    ),
+    "Uranus": (
+        (0.76986, -2.09),
+        (74.22988, -1681.40),
+        (170.96424, 1312.56),
+        (19.19126393, 0.00152025),
+        (0.04716771, -0.00019150),
+        (313.23218, 1542547.79),
+    ),
+    "Neptune": (
+        (1.76917, -3.64),
+        (131.72169, -151.25),
+        (44.97135, -844.43),
+        (30.06896348, -0.00125196),
+        (0.00858587, 0.00002510),
+        (304.88003, 786449.21),
+    ),
+    "Pluto": (
+        (17.14175, 11.07),
+        (110.30347, -37.33),
+        (224.06676, -132.25),
+        (39.48168677, -0.00076912),
+        (0.24880766, 0.00006465),
+        (238.92881, 522747.90),
+    ),
+}
+
+
 def _planetary_elements(name: str, c: float) -> tuple[float, float, float, float, float, float]:
     """Return inclination, longitude of ascending node, longitude of perihelion,
     semi-major axis, eccentricity, and mean longitude (all in radians)."""
-    switch = {
-        "Sun": (
-            (0.00005 - 46.94 * c / 3600) * math.pi / 180,
-            (-11.26064 - 18228.25 * c / 3600) * math.pi / 180,
-            (102.94719 + 1198.28 * c / 3600) * math.pi / 180,
-            1.00000011 - 0.00000005 * c,
-            0.01671022 - 0.00003804 * c,
-            (_mod2pi((100.46435 + 129597740.63 * c / 3600) * math.pi / 180)),
-        ),
-        "Mercury": (
-            (7.00487 - 23.51 * c / 3600) * math.pi / 180,
-            (48.33167 - 446.3 * c / 3600) * math.pi / 180,
-            (77.45645 + 573.57 * c / 3600) * math.pi / 180,
-            0.38709893 + 0.00000066 * c,
-            0.20563069 + 0.00002527 * c,
-            _mod2pi((252.25084 + 538101628.29 * c / 3600) * math.pi / 180),
-        ),
-        "Venus": (
-            (3.39471 - 2.86 * c / 3600) * math.pi / 180,
-            (76.68069 - 996.89 * c / 3600) * math.pi / 180,
-            (131.53298 - 108.8 * c / 3600) * math.pi / 180,
-            0.72333199 + 0.00000092 * c,
-            0.00677323 - 0.00004938 * c,
-            _mod2pi((181.97973 + 210664136.06 * c / 3600) * math.pi / 180),
-        ),
-        "Mars": (
-            (1.85061 - 25.47 * c / 3600) * math.pi / 180,
-            (49.57854 - 1020.19 * c / 3600) * math.pi / 180,
-            (336.04084 + 1560.78 * c / 3600) * math.pi / 180,
-            1.52366231 - 0.00007221 * c,
-            0.09341233 + 0.00011902 * c,
-            _mod2pi((355.45332 + 68905103.78 * c / 3600) * math.pi / 180),
-        ),
-        "Jupiter": (
-            (1.30530 - 4.15 * c / 3600) * math.pi / 180,
-            (100.55615 + 1217.17 * c / 3600) * math.pi / 180,
-            (14.75385 + 839.93 * c / 3600) * math.pi / 180,
-            5.20336301 + 0.00060737 * c,
-            0.04839266 - 0.00012880 * c,
-            _mod2pi((34.40438 + 10925078.35 * c / 3600) * math.pi / 180),
-        ),
-        "Saturn": (
-            (2.48446 + 6.11 * c / 3600) * math.pi / 180,
-            (113.71504 - 1591.05 * c / 3600) * math.pi / 180,
-            (92.43194 - 1948.89 * c / 3600) * math.pi / 180,
-            9.53707032 - 0.00301530 * c,
-            0.05415060 - 0.00036762 * c,
-            _mod2pi((49.94432 + 4401052.95 * c / 3600) * math.pi / 180),
-        ),
-        "Uranus": (
-            (0.76986 - 2.09 * c / 3600) * math.pi / 180,
-            (74.22988 - 1681.40 * c / 3600) * math.pi / 180,
-            (170.96424 + 1312.56 * c / 3600) * math.pi / 180,
-            19.19126393 + 0.00152025 * c,
-            0.04716771 - 0.00019150 * c,
-            _mod2pi((313.23218 + 1542547.79 * c / 3600) * math.pi / 180),
-        ),
-        "Neptune": (
-            (1.76917 - 3.64 * c / 3600) * math.pi / 180,
-            (131.72169 - 151.25 * c / 3600) * math.pi / 180,
-            (44.97135 - 844.43 * c / 3600) * math.pi / 180,
-            30.06896348 - 0.00125196 * c,
-            0.00858587 + 0.00002510 * c,
-            _mod2pi((304.88003 + 786449.21 * c / 3600) * math.pi / 180),
-        ),
-        "Pluto": (
-            (17.14175 + 11.07 * c / 3600) * math.pi / 180,
-            (110.30347 - 37.33 * c / 3600) * math.pi / 180,
-            (224.06676 - 132.25 * c / 3600) * math.pi / 180,
-            39.48168677 - 0.00076912 * c,
-            0.24880766 + 0.00006465 * c,
-            _mod2pi((238.92881 + 522747.90 * c / 3600) * math.pi / 180),
-        ),
-    }
-    return switch.get(name, ())
+    elements = _ORBITAL_ELEMENTS.get(name)
+    if elements is None:
+        return ()
+    (i0, i1), (n0, n1), (p0, p1), (a0, a1), (e0, e1), (l0, l1) = elements
+    return (
+        (i0 + i1 * c / 3600) * math.pi / 180,
+        (n0 + n1 * c / 3600) * math.pi / 180,
+        (p0 + p1 * c / 3600) * math.pi / 180,
+        a0 + a1 * c,
+        e0 + e1 * c,
+        _mod2pi((l0 + l1 * c / 3600) * math.pi / 180),
+    )
+
+
+# Jupiter central-meridian systems: reference longitude at J2000 (approximate)
+# and rotation rate in degrees/day.
+_JUPITER_SYSTEMS = (
+    ("system_i", 84.0, 869.82),
+    ("system_ii", 275.0, 870.27),
+    ("system_iii", 23.0, 870.536),
+)
+_J2000_JD = 2451545.0
 
 
 def _jupiter_system_longitudes(jd: float) -> dict[str, float]:
-    # rates in degrees/day
-    rates = {"system_i": 869.82, "system_ii": 870.27, "system_iii": 870.536}
-    # reference longitudes at J2000 (approximate)
-    offsets = {"system_i": 84.0, "system_ii": 275.0, "system_iii": 23.0}
-    base_jd = 2451545.0
-    delta = jd - base_jd
-    return {
-        key: round((offsets[key] + rates[key] * delta) % 360, 2) for key in rates
-    }
+    delta = jd - _J2000_JD
+    return {key: round((offset + rate * delta) % 360, 2) for key, offset, rate in _JUPITER_SYSTEMS}
 
 
 def planetary_coordinates(observed_at: datetime, name: str, latitude: float | None = None, longitude: float | None = None) -> dict | None:
     if observed_at is None:
         return None
+    # The computation is pure, and images are viewed far more often than
+    # they are uploaded; hand each caller its own copy of the cached dict,
+    # including the nested Jupiter systems.
+    result = _cached_planetary_coordinates(observed_at, name, latitude, longitude)
+    if result is None:
+        return None
+    result = dict(result)
+    if "jupiter_systems" in result:
+        result["jupiter_systems"] = dict(result["jupiter_systems"])
+    return result
+
+
+@lru_cache(maxsize=8192)
+def _cached_planetary_coordinates(
+    observed_at: datetime, name: str, latitude: float | None, longitude: float | None
+) -> dict | None:
     name_clean = name.strip().title()
-    params = _planetary_elements(name_clean, _centuries_since_j2000(observed_at))
+    j2000 = (observed_at.replace(tzinfo=timezone.utc) - EPOCH).total_seconds() / 86400.0
+    c = j2000 / 36525.0
+    params = _planetary_elements(name_clean, c)
     if not params:
         return None
     inclination, long_node, long_peri, mean_dist, eccentricity, mean_long = params
@@ -123,41 +164,34 @@ def planetary_coordinates(observed_at: datetime, name: str, latitude: float | No
     p_planet_orbit = mean_dist * (1 - eccentricity ** 2) / (1 + eccentricity * math.cos(ve))
 
     mass = p_planet_orbit
-    xh = mass * (
-        math.cos(long_node) * math.cos(ve + long_peri - long_node)
-        - math.sin(long_node) * math.sin(ve + long_peri - long_node) * math.cos(inclination)
-    )
-    yh = mass * (
-        math.sin(long_node) * math.cos(ve + long_peri - long_node)
-        + math.cos(long_node) * math.sin(ve + long_peri - long_node) * math.cos(inclination)
-    )
-    zh = mass * math.sin(ve + long_peri - long_node) * math.sin(inclination)
-
-    epoch = EPOCH
-    j2000 = (observed_at.replace(tzinfo=timezone.utc) - epoch).total_seconds() / 86400.0
-    c = j2000 / 36525.0
-    inclination_e = (0.00005 - 46.94 * c / 3600) * math.pi / 180
-    long_node_e = (-11.26064 - 18228.25 * c / 3600) * math.pi / 180
-    long_peri_e = (102.94719 + 1198.28 * c / 3600) * math.pi / 180
-    mean_dist_e = 1.00000011 - 0.00000005 * c
-    eccentricity_e = 0.01671022 - 0.00003804 * c
-    mean_long_e = _mod2pi((100.46435 + 129597740.63 * c / 3600) * math.pi / 180)
+    # Argument of latitude and node angles, each evaluated once.
+    arg_lat = ve + long_peri - long_node
+    sin_u, cos_u = math.sin(arg_lat), math.cos(arg_lat)
+    sin_node, cos_node = math.sin(long_node), math.cos(long_node)
+    cos_incl = math.cos(inclination)
+    xh = mass * (cos_node * cos_u - sin_node * sin_u * cos_incl)
+    yh = mass * (sin_node * cos_u + cos_node * sin_u * cos_incl)
+    zh = mass * sin_u * math.sin(inclination)
+
+    # Earth's orbit is the "Sun" row of the element table.
+    earth = params if name_clean == "Sun" else _planetary_elements("Sun", c)
+    _, _, long_peri_e, mean_dist_e, eccentricity_e, mean_long_e = earth
 
     me = _mod2pi(mean_long_e - long_peri_e)
     ve = _true_anomaly(me, eccentricity_e)
     p_earth_orbit = mean_dist_e * (1 - eccentricity_e ** 2) / (1 + eccentricity_e * math.cos(ve))
-    xe = p_earth_orbit * math.cos(ve + long_peri_e)
-    ye = p_earth_orbit * math.sin(ve + long_peri_e)
+    earth_lon = ve + long_peri_e
+    xe = p_earth_orbit * math.cos(earth_lon)
+    ye = p_earth_orbit * math.sin(earth_lon)
     ze = 0.0
 
     xg = xh - xe
     yg = yh - ye
     zg = zh - ze
 
-    ecl = 23.439281 * math.pi / 180
     xeq = xg
-    yeq = yg * math.cos(ecl) - zg * math.sin(ecl)
-    zeq = yg * math.sin(ecl) + zg * math.cos(ecl)
+    yeq = yg * _COS_ECL - zg * _SIN_ECL
+    zeq = yg * _SIN_ECL + zg * _COS_ECL
 
     ra_rad = _mod2pi(math.atan2(yeq, xeq))
     dec_rad = math.atan2(zeq, math.sqrt(xeq ** 2 + yeq ** 2))
@@ -195,16 +229,10 @@ def planetary_coordinates(observed_at: datetime, name: str, latitude: float | No
             }
         )
     if name_clean == "Jupiter":
-        result["jupiter_systems"] = _jupiter_system_longitudes(2451545.0 + j2000)
+        result["jupiter_systems"] = _jupiter_system_longitudes(_J2000_JD + j2000)
     return result
 
 
-def _centuries_since_j2000(observed_at: datetime) -> float:
-    if observed_at.tzinfo is None:
-        observed_at = observed_at.replace(tzinfo=timezone.utc)
-    return (observed_at - EPOCH).total_seconds() / (86400 * 36525)
-
-
 def _local_sidereal_time(longitude: float, j2000: float, c: float) -> float:
     lst = (
         280.46061837
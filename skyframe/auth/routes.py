@@ -1,13 +1,16 @@
 from flask import flash, redirect, render_template, request, url_for, current_app
 from flask_login import current_user, login_user, logout_user
 
-from ..extensions import db, limiter
+from ..extensions import csrf_protect, db, limiter
 from ..forms import LoginForm, RegistrationForm, password_requirements_summary
 from ..models import User
 from . import bp
 
 
+# The global CSRF hook runs before the limiter, so rejected bursts would still
+# pay for token checks; the forms validate CSRF themselves after the limit.
 @bp.route("/register", methods=["GET", "POST"])
+@csrf_protect.exempt
 @limiter.limit("5 per minute")
 def register():
     if current_user.is_authenticated:
@@ -36,6 +39,7 @@ def register():
 
 
 @bp.route("/login", methods=["GET", "POST"])
+@csrf_protect.exempt
 @limiter.limit("6 per minute")
 def login():
     if current_user.is_authenticated:
@@ -51,6 +55,8 @@ def login():
             flash("This account is disabled. Please contact support.", "danger")
             return render_template("auth/login.html", form=form)
         if user and user.check_password(form.password.data):
+            if db.session.is_modified(user):
+                db.session.commit()
             login_user(user)
             current_app.logger.info("User logged in: %s", user.username)
             flash("Welcome back", "success")
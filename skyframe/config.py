@@ -1,17 +1,90 @@
+import atexit
 import logging
 import os
+import queue
 import secrets
-from logging.handlers import RotatingFileHandler
+import tempfile
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 load_dotenv(dotenv_path=PROJECT_ROOT / "instance" / ".env")
+SECRET_KEY_PATH = PROJECT_ROOT / "instance" / ".secret_key"
+
+
+def _read_secret_key() -> str | None:
+    try:
+        return SECRET_KEY_PATH.read_text().strip()
+    except OSError:
+        # Missing, or e.g. created 0600 by a script run as another user.
+        return None
+
+
+def _load_secret_key() -> str:
+    # A key minted per process would log everyone out on restart and break
+    # sessions across gunicorn workers, so persist one per install.
+    key = os.getenv("SECRET_KEY")
+    if key:
+        return key
+    existing = _read_secret_key()
+    if existing:
+        return existing
+    key = secrets.token_urlsafe(32)
+    try:
+        SECRET_KEY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=SECRET_KEY_PATH.parent)
+        with os.fdopen(fd, "w") as fh:
+            fh.write(key)
+        try:
+            if existing == "":
+                # An empty file left by an interrupted write counts as missing.
+                os.replace(tmp_path, SECRET_KEY_PATH)
+            else:
+                # link() publishes the complete file or fails if another
+                # worker got there first, in which case its key wins.
+                os.link(tmp_path, SECRET_KEY_PATH)
+        except FileExistsError:
+            key = _read_secret_key() or key
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    except OSError:
+        # Read-only instance directory: fall back to a per-process key.
+        pass
+    return key
+
+
+class _ProcessQueueHandler(QueueHandler):
+    """Queue records for a writer thread started on first use in each process."""
+
+    def __init__(self, target: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self._pid = None
+
+    def enqueue(self, record):
+        # Requests only enqueue; the thread does the file writes and rollovers.
+        # It is started lazily so a preloaded gunicorn master forks no thread,
+        # and a forked child gets a fresh queue rather than the parent's copy,
+        # whose pending records the parent writes itself. Runs under the
+        # handler lock, which logging reinitializes after fork.
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self.queue = queue.SimpleQueue()
+            listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+        super().enqueue(record)
+
+
+_log_handler: _ProcessQueueHandler | None = None
 
 
 class Config:
-    SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
+    SECRET_KEY = _load_secret_key()
     SQLALCHEMY_DATABASE_URI = os.getenv(
         "DATABASE_URL", f"sqlite:///{PROJECT_ROOT / 'instance' / 'skyframe.db'}"
     )
@@ -26,6 +99,11 @@ class Config:
     WTF_CSRF_CHECK_DEFAULT = True
     MAX_CONTENT_LENGTH = 12 * 1024 * 1024  # 12MB uploads max
     UPLOAD_PATH = PROJECT_ROOT / "uploads"
+    # Hand image downloads to the fronting server instead of streaming them
+    # through the worker: X-Sendfile (Apache/lighttpd) or an nginx internal
+    # location prefix mapped to UPLOAD_PATH for X-Accel-Redirect.
+    USE_X_SENDFILE = os.getenv("USE_X_SENDFILE", "False").lower() in ("1", "true", "yes")
+    X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "")
     IMAGE_SUBDIR = "images"
     THUMB_SUBDIR = "thumbs"
     AVATAR_SUBDIR = "avatars"
@@ -47,6 +125,10 @@ class Config:
     )
     VERIFY_PHASH_MAX_DISTANCE = int(os.getenv("VERIFY_PHASH_MAX_DISTANCE", "10"))
     VERIFY_DHASH_MAX_DISTANCE = int(os.getenv("VERIFY_DHASH_MAX_DISTANCE", "12"))
+    # Flask-Limiter counters; point at Redis (redis://host:6379/1) so every
+    # worker shares one fixed-window count instead of keeping its own.
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "fixed-window")
     PREFERRED_URL_SCHEME = "https"
     CACHE_TYPE = "simple"
     REPORT_EMAIL = None
@@ -66,6 +148,10 @@ class Config:
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", "10485760"))
     LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    # Argon2id cost for new hashes; existing hashes are upgraded on next login.
+    ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+    ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))
+    ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))
     PASSWORD_MIN_LENGTH = int(os.getenv("PASSWORD_MIN_LENGTH", "12"))
     PASSWORD_REQUIRE_UPPER = os.getenv("PASSWORD_REQUIRE_UPPER", "True").lower() in ("1", "true", "yes")
     PASSWORD_REQUIRE_LOWER = os.getenv("PASSWORD_REQUIRE_LOWER", "True").lower() in ("1", "true", "yes")
@@ -74,22 +160,28 @@ class Config:
 
     @classmethod
     def init_app(cls, app):
-        log_dir = cls.LOG_DIR
-        log_dir.mkdir(parents=True, exist_ok=True)
-        handler = RotatingFileHandler(
-            log_dir / cls.LOG_FILE,
-            maxBytes=cls.LOG_MAX_BYTES,
-            backupCount=cls.LOG_BACKUP_COUNT,
-        )
+        global _log_handler
         level = getattr(logging, cls.LOG_LEVEL, logging.INFO)
-        handler.setLevel(level)
-        handler.setFormatter(
-            logging.Formatter(
-                "%(asctime)s %(levelname)s [%(name)s] %(message)s", "%Y-%m-%d %H:%M:%S"
+        # One file handler per process, however many apps scripts and tests
+        # build; every app logger shares it.
+        if _log_handler is None:
+            log_dir = cls.LOG_DIR
+            log_dir.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                log_dir / cls.LOG_FILE,
+                maxBytes=cls.LOG_MAX_BYTES,
+                backupCount=cls.LOG_BACKUP_COUNT,
+            )
+            handler.setLevel(level)
+            handler.setFormatter(
+                logging.Formatter(
+                    "%(asctime)s %(levelname)s [%(name)s] %(message)s", "%Y-%m-%d %H:%M:%S"
+                )
             )
-        )
+            _log_handler = _ProcessQueueHandler(handler)
         app.logger.setLevel(level)
-        app.logger.addHandler(handler)
+        if _log_handler not in app.logger.handlers:
+            app.logger.addHandler(_log_handler)
 
 
 class DevelopmentConfig(Config):
@@ -104,3 +196,10 @@ class ProductionConfig(Config):
     HSTS_SECONDS = 31536000
     HSTS_INCLUDE_SUBDOMAINS = True
     HSTS_PRELOAD = True
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+        "pool_use_lifo": True,
+    }
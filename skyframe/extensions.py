@@ -1,9 +1,13 @@
+import sqlite3
+
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -12,3 +16,14 @@ login_manager.session_protection = "strong"
 migrate = Migrate()
 csrf_protect = CSRFProtect()
 limiter = Limiter(key_func=get_remote_address, default_limits=["2000 per day", "600 per hour"])
+
+
+@event.listens_for(Engine, "connect")
+def _tune_sqlite(dbapi_connection, _connection_record):
+    # WAL lets feed reads proceed while seen-history and engagement writes
+    # commit; NORMAL sync is durable across app crashes in WAL mode.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
-from collections import defaultdict
+import re
+from collections import defaultdict, deque
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
 
-from sqlalchemy import func, or_
+from sqlalchemy import Integer, all_, delete, func, literal, or_, select, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
 
 from .extensions import db
-from .models import FeedSeen, Image
+from .models import Favorite, FeedSeen, Follow, Image, Like
+
+# The shape format_feed_cursor emits; anything else takes the slow path below.
+_FEED_CURSOR_RE = re.compile(r"p=([^|]*)\|g=([^|]*)")
 
 
 @dataclass
@@ -24,9 +33,27 @@ class FeedSelection:
     has_more: bool
 
 
+def load_user_edge_sets(user_id: int) -> tuple[set[int], set[int], set[int]]:
+    # Liked image ids, favorited image ids and followed user ids in one round trip.
+    rows = db.session.execute(
+        union_all(
+            select(literal("like"), Like.image_id).where(Like.user_id == user_id),
+            select(literal("favorite"), Favorite.image_id).where(Favorite.user_id == user_id),
+            select(literal("follow"), Follow.followed_id).where(Follow.follower_id == user_id),
+        )
+    )
+    edges: dict[str, set[int]] = {"like": set(), "favorite": set(), "follow": set()}
+    for kind, target_id in rows:
+        edges[kind].add(target_id)
+    return edges["like"], edges["favorite"], edges["follow"]
+
+
 def parse_feed_cursor(cursor: str | None) -> FeedCursor:
     if not cursor:
         return FeedCursor()
+    match = _FEED_CURSOR_RE.fullmatch(cursor)
+    if match:
+        return FeedCursor(prioritized=match[1] or None, global_new=match[2] or None)
     if "|" in cursor and ("p=" in cursor or "g=" in cursor):
         parts = cursor.split("|")
         parsed = FeedCursor()
@@ -47,53 +74,76 @@ def format_feed_cursor(prioritized: str | None, global_new: str | None) -> str:
     return f"p={prioritized or ''}|g={global_new or ''}"
 
 
-def _parse_cursor_point(cursor_value: str | None):
+@lru_cache(maxsize=1024)
+def parse_cursor_point(cursor_value: str | None) -> tuple[datetime | None, int | None]:
+    # Clients refetching the same page resend the same cursor string.
     if not cursor_value:
         return None, None
+    timestamp, sep, image_id = cursor_value.partition("_")
+    # int() would accept "1_2" as 12; only a plain run of digits is an id.
+    if not sep or not image_id.isdigit():
+        return None, None
     try:
-        timestamp, image_id = cursor_value.split("_")
         return datetime.fromisoformat(timestamp), int(image_id)
     except ValueError:
         return None, None
 
 
+def observed_before(cursor_point: datetime, cursor_image_id: int):
+    # Row-value comparison so the planner range-scans ix_images_observed_id.
+    return tuple_(Image.observed_at, Image.id) < tuple_(cursor_point, cursor_image_id)
+
+
 def _apply_cursor(query, cursor_value: str | None):
-    cursor_point, cursor_image_id = _parse_cursor_point(cursor_value)
+    cursor_point, cursor_image_id = parse_cursor_point(cursor_value)
     if cursor_point is None:
         return query
-    return query.filter(
-        (Image.observed_at < cursor_point)
-        | ((Image.observed_at == cursor_point) & (Image.id < cursor_image_id))
-    )
+    return query.filter(observed_before(cursor_point, cursor_image_id))
 
 
-def _prioritized_filter(liked_ids: set[int], following_ids: set[int]):
-    conditions = []
-    if liked_ids:
-        conditions.append(Image.id.in_(liked_ids))
-    if following_ids:
-        conditions.append(Image.user_id.in_(following_ids))
-    if not conditions:
-        return None
-    return or_(*conditions)
+def _excluding_ids(column, ids: set[int]):
+    if db.engine.dialect.name == "postgresql":
+        # One array parameter instead of a placeholder per seen id, so the
+        # statement text stays the same size however long the history is.
+        return column != all_(literal(list(ids), ARRAY(Integer)))
+    return ~column.in_(ids)
+
+
+def _prioritized_filter(user_id: int):
+    # Semi-joins on the edge tables' primary keys instead of sending the
+    # viewer's like and follow sets back as literal IN lists.
+    return or_(
+        Image.id.in_(select(Like.image_id).where(Like.user_id == user_id)),
+        Image.user_id.in_(select(Follow.followed_id).where(Follow.follower_id == user_id)),
+    )
 
 
 def _pop_next_valid(
-    pool: list[Image],
+    pool: deque[Image],
     per_uploader_counts: dict[int, int],
     last_uploader: int | None,
     consecutive: int,
     max_per_uploader: int,
     max_consecutive: int,
 ):
-    for idx, image in enumerate(pool):
+    # Counts only grow, so images over the per-uploader cap are dropped for
+    # good; those held back by the consecutive limit go back in order.
+    held: list[Image] = []
+    selected = None
+    while pool:
+        image = pool.popleft()
         uploader_id = image.user_id
         if max_per_uploader > 0 and per_uploader_counts[uploader_id] >= max_per_uploader:
             continue
         if max_consecutive > 0 and last_uploader == uploader_id and consecutive >= max_consecutive:
+            held.append(image)
             continue
-        return pool.pop(idx), uploader_id
-    return None, last_uploader
+        selected = image
+        break
+    pool.extendleft(reversed(held))
+    if selected is None:
+        return None, last_uploader
+    return selected, selected.user_id
 
 
 def _blend_feed(
@@ -104,6 +154,8 @@ def _blend_feed(
     max_per_uploader: int,
     max_consecutive: int,
 ):
+    prioritized = deque(prioritized)
+    global_new = deque(global_new)
     output: list[Image] = []
     per_uploader_counts: dict[int, int] = defaultdict(int)
     last_uploader = None
@@ -186,43 +238,76 @@ def _fresh_cutoff(days: int | None):
 
 def _load_seen_ids(user_id: int, retention_days: int, max_ids: int):
     cutoff = _fresh_cutoff(retention_days)
-    query = FeedSeen.query.filter_by(user_id=user_id)
+    query = db.session.query(FeedSeen.image_id).filter(FeedSeen.user_id == user_id)
     if cutoff:
         query = query.filter(FeedSeen.seen_at >= cutoff)
-    rows = query.order_by(FeedSeen.seen_at.desc()).limit(max_ids).all()
-    return {row.image_id for row in rows}
+    rows = query.order_by(FeedSeen.seen_at.desc()).limit(max_ids)
+    return {image_id for (image_id,) in rows}
+
+
+_SEEN_UPSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
 
 
 def _persist_seen_ids(user_id: int, image_ids: list[int], retention_days: int):
     if not image_ids:
         return
     now = datetime.utcnow()
-    existing = {
-        row.image_id
-        for row in FeedSeen.query.filter(
-            FeedSeen.user_id == user_id, FeedSeen.image_id.in_(image_ids)
-        ).all()
-    }
-    new_rows = [
-        FeedSeen(user_id=user_id, image_id=image_id, seen_at=now)
-        for image_id in image_ids
-        if image_id not in existing
-    ]
-    changed = False
-    if new_rows:
-        db.session.bulk_save_objects(new_rows)
-        changed = True
-    if retention_days > 0:
-        cutoff = datetime.utcnow() - timedelta(days=retention_days)
-        removed = FeedSeen.query.filter(
-            FeedSeen.user_id == user_id, FeedSeen.seen_at < cutoff
-        ).delete()
-        if removed:
-            changed = True
+    # Rows past retention are ignored by _load_seen_ids, so seeing the image
+    # again must refresh them or it would never count as seen until a prune.
+    cutoff = _fresh_cutoff(retention_days)
+    upsert = _SEEN_UPSERTS.get(db.engine.dialect.name)
+    if upsert is not None:
+        # uq_feed_seen_user_image lets the database resolve already-seen ids in
+        # the same statement instead of a SELECT round trip first.
+        rows = [{"user_id": user_id, "image_id": image_id, "seen_at": now} for image_id in image_ids]
+        stmt = upsert(FeedSeen).values(rows)
+        if cutoff:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "image_id"],
+                set_={"seen_at": stmt.excluded.seen_at},
+                where=FeedSeen.__table__.c.seen_at < cutoff,
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing()
+        changed = db.session.execute(stmt).rowcount
+    else:
+        existing = dict(
+            db.session.query(FeedSeen.image_id, FeedSeen.seen_at).filter(
+                FeedSeen.user_id == user_id, FeedSeen.image_id.in_(image_ids)
+            )
+        )
+        new_rows = [
+            {"user_id": user_id, "image_id": image_id, "seen_at": now}
+            for image_id in image_ids
+            if image_id not in existing
+        ]
+        expired = [
+            image_id for image_id, seen_at in existing.items() if cutoff and seen_at < cutoff
+        ]
+        if new_rows:
+            db.session.execute(FeedSeen.__table__.insert(), new_rows)
+        if expired:
+            db.session.execute(
+                update(FeedSeen)
+                .where(FeedSeen.user_id == user_id, FeedSeen.image_id.in_(expired))
+                .values(seen_at=now)
+            )
+        changed = len(new_rows) + len(expired)
     if changed:
         db.session.commit()
 
 
+def prune_seen(retention_days: int) -> int:
+    # Retention is enforced on read by _load_seen_ids; this only reclaims the
+    # rows, for all users at once, from a periodic job rather than the feed.
+    cutoff = _fresh_cutoff(retention_days)
+    if cutoff is None:
+        return 0
+    removed = db.session.execute(delete(FeedSeen).where(FeedSeen.seen_at < cutoff)).rowcount
+    db.session.commit()
+    return removed
+
+
 def build_feed_selection(
     *,
     liked_ids: set[int],
@@ -245,11 +330,11 @@ def build_feed_selection(
         seen_ids = _load_seen_ids(seen_user_id, seen_retention_days, seen_max_ids)
 
     def _fetch_ordered(active_cutoff, active_seen_ids):
-        query = Image.query
+        query = Image.query.options(selectinload(Image.uploader))
         if active_cutoff:
             query = query.filter(Image.observed_at >= active_cutoff)
         if active_seen_ids:
-            query = query.filter(~Image.id.in_(active_seen_ids))
+            query = query.filter(_excluding_ids(Image.id, active_seen_ids))
         if not use_seen:
             query = _apply_cursor(query, cursor_state.global_new or cursor)
         return (
@@ -1,4 +1,6 @@
+import re
 from datetime import datetime
+from functools import lru_cache
 
 from flask_wtf import FlaskForm
 from wtforms import (
@@ -22,37 +24,41 @@ from wtforms.validators import (
 )
 
 from .config import Config
+from .extensions import db
 from .models import User
 
 
-CATEGORY_CHOICES = [
+# \Z rather than $, which would also accept a trailing newline.
+USERNAME_RE = re.compile(r"^[A-Za-z0-9_]+\Z")
+
+CATEGORY_CHOICES = (
     ("Planets", "Planets"),
     ("Deep Sky", "Deep Sky"),
     ("Comets", "Comets"),
     ("Sun", "Sun"),
     ("Moon", "Moon"),
     ("Other", "Other"),
-]
+)
 
-SEARCH_CATEGORY_CHOICES = [("", "Any")] + CATEGORY_CHOICES
+SEARCH_CATEGORY_CHOICES = (("", "Any"),) + CATEGORY_CHOICES
 
-SEEING_CHOICES = [
+SEEING_CHOICES = (
     ("5", "5 — Excellent: No blur, Milky Way bright, extreme contrast."),
     ("4", "4 — Good: Slight contrast loss, still excellent."),
     ("3", "3 — Average: Mild blur, brighter background."),
     ("2", "2 — Poor: Humidity, thin clouds, fuzziness."),
     ("1", "1 — Very poor: Milky Way milky, not useful for high-res."),
-]
+)
 
-TRANSPARENCY_CHOICES = [
+TRANSPARENCY_CHOICES = (
     ("5", "5 — Excellent: Crystal clear, excellent stars."),
     ("4", "4 — Good: Minor haze, still solid detail."),
     ("3", "3 — Average: Light haze, moderate glow."),
     ("2", "2 — Poor: Noticeable haze or dust."),
     ("1", "1 — Very poor: Thick haze or light pollution."),
-]
+)
 
-BORTLE_CHOICES = [
+BORTLE_CHOICES = (
     ("1", "1 — Excellent dark-sky (pristine)."),
     ("2", "2 — Very dark sky."),
     ("3", "3 — Rural sky."),
@@ -62,37 +68,74 @@ BORTLE_CHOICES = [
     ("7", "7 — Urban sky."),
     ("8", "8 — City sky."),
     ("9", "9 — Inner-city with heavy light pollution."),
-]
+)
+
+AVATAR_CHOICES = (
+    ("default", "Default icon"),
+    ("gravatar", "Gravatar"),
+    ("upload", "Upload"),
+)
+
+# Character-class bits for password_complexity.
+_HAS_LOWER, _HAS_UPPER, _HAS_DIGIT, _HAS_SYMBOL = 1, 2, 4, 8
+PASSWORD_SYMBOLS = frozenset("!@#$%^&*()-_+=")
 
 
 def password_complexity(form, field):
     password = field.data or ""
     if len(password) < Config.PASSWORD_MIN_LENGTH:
         raise ValidationError("Password must be at least 12 characters.")
-    tests = []
+    missing = 0
     if Config.PASSWORD_REQUIRE_LOWER:
-        tests.append(any(c.islower() for c in password))
+        missing |= _HAS_LOWER
     if Config.PASSWORD_REQUIRE_UPPER:
-        tests.append(any(c.isupper() for c in password))
+        missing |= _HAS_UPPER
     if Config.PASSWORD_REQUIRE_DIGIT:
-        tests.append(any(c.isdigit() for c in password))
+        missing |= _HAS_DIGIT
     if Config.PASSWORD_REQUIRE_SYMBOL:
-        tests.append(any(c in "!@#$%^&*()-_+=" for c in password))
-    if tests and not all(tests):
+        missing |= _HAS_SYMBOL
+    # One pass over the password, stopping as soon as every required class
+    # has turned up; the classes are disjoint.
+    for c in password:
+        if not missing:
+            break
+        if c.islower():
+            missing &= ~_HAS_LOWER
+        elif c.isupper():
+            missing &= ~_HAS_UPPER
+        elif c.isdigit():
+            missing &= ~_HAS_DIGIT
+        elif c in PASSWORD_SYMBOLS:
+            missing &= ~_HAS_SYMBOL
+    if missing:
         raise ValidationError("Password must include upper, lower, number, and symbol.")
 
 
 def password_requirements_summary():
+    return _password_requirements_summary(
+        Config.PASSWORD_MIN_LENGTH,
+        Config.PASSWORD_REQUIRE_UPPER,
+        Config.PASSWORD_REQUIRE_LOWER,
+        Config.PASSWORD_REQUIRE_DIGIT,
+        Config.PASSWORD_REQUIRE_SYMBOL,
+    )
+
+
+@lru_cache(maxsize=8)
+def _password_requirements_summary(
+    min_length: int, upper: bool, lower: bool, digit: bool, symbol: bool
+) -> str:
+    # Keyed on the policy, so the sentence is built once per configuration.
     requirements = []
-    if Config.PASSWORD_REQUIRE_UPPER:
+    if upper:
         requirements.append("uppercase")
-    if Config.PASSWORD_REQUIRE_LOWER:
+    if lower:
         requirements.append("lowercase")
-    if Config.PASSWORD_REQUIRE_DIGIT:
+    if digit:
         requirements.append("a digit")
-    if Config.PASSWORD_REQUIRE_SYMBOL:
+    if symbol:
         requirements.append("a symbol")
-    base = f"Password must be at least {Config.PASSWORD_MIN_LENGTH} characters"
+    base = f"Password must be at least {min_length} characters"
     if requirements:
         if len(requirements) == 1:
             req_str = requirements[0]
@@ -102,6 +145,11 @@ def password_requirements_summary():
     return base + "."
 
 
+def _user_exists(**criteria) -> bool:
+    # EXISTS probe on the unique index; no need to load the row.
+    return db.session.query(User.query.filter_by(**criteria).exists()).scalar()
+
+
 class RegistrationForm(FlaskForm):
     email = EmailField(
         "Email",
@@ -110,7 +158,7 @@ class RegistrationForm(FlaskForm):
     )
     username = StringField(
         "Username",
-        validators=[DataRequired(), Length(min=3, max=80), Regexp(r"^[A-Za-z0-9_]+$")],
+        validators=[DataRequired(), Length(min=3, max=80), Regexp(USERNAME_RE)],
         render_kw={"autocomplete": "username"},
     )
     password = PasswordField(
@@ -125,11 +173,11 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField("Create account")
 
     def validate_email(self, field):
-        if User.query.filter_by(email=field.data.lower()).first():
+        if _user_exists(email=field.data.lower()):
             raise ValidationError("Registration paused; try unique credential.")
 
     def validate_username(self, field):
-        if User.query.filter_by(username=field.data.lower()).first():
+        if _user_exists(username=field.data.lower()):
             raise ValidationError("Choose another handle.")
 
 
@@ -210,7 +258,7 @@ class SearchForm(FlaskForm):
 class ProfileForm(FlaskForm):
     avatar_type = SelectField(
         "Avatar Source",
-        choices=[("default", "Default icon"), ("gravatar", "Gravatar"), ("upload", "Upload")],
+        choices=AVATAR_CHOICES,
         validators=[DataRequired()],
     )
     avatar_upload = FileField("Upload Avatar", validators=[Optional()])
@@ -6,6 +6,7 @@ from flask import (
     abort,
     current_app,
     flash,
+    g,
     jsonify,
     redirect,
     render_template,
@@ -15,10 +16,11 @@ from flask import (
 )
 from flask_login import current_user, login_required
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 
 from ..extensions import db, limiter
 from ..forms import CommentForm, ImageEditForm, ProfileForm, SearchForm, UploadForm
-from ..models import Favorite, Follow, Image, Like, Motd, MotdSeen, User
+from ..models import Favorite, Image, Motd, MotdSeen, User
 from ..share_storage import read_share_token
 from ..astro import planetary_coordinates
 from ..storage import (
@@ -28,26 +30,30 @@ from ..storage import (
     winjupos_label_from_metadata,
 )
 from ..config import Config
-from ..feed import build_feed_selection, persist_seen_for_feed
+from ..feed import (
+    build_feed_selection,
+    load_user_edge_sets,
+    observed_before,
+    parse_cursor_point,
+    persist_seen_for_feed,
+)
 import zipfile
 from . import bp
 
+ARCHIVE_MAX_BYTES = 100 * 1024 * 1024
+TAG_RE = re.compile(r"#([A-Za-z0-9_\\-]+)")
+
 
 @bp.before_app_request
 def _load_nonce():
-    from secrets import token_urlsafe
-
-    request.csp_nonce = token_urlsafe(16)
+    # Reuse the app-wide nonce so templates match the CSP header.
+    request.csp_nonce = getattr(g, "csp_nonce", "")
 
 
 def _extract_tags(notes: str | None) -> list[str]:
     if not notes:
         return []
-    return re.findall(r"#([A-Za-z0-9_\\-]+)", notes)
-
-
-
-ARCHIVE_MAX_BYTES = 100 * 1024 * 1024
+    return TAG_RE.findall(notes)
 
 
 def _active_motd_for_user(user_id: int | None):
@@ -55,7 +61,8 @@ def _active_motd_for_user(user_id: int | None):
         return None
     now = datetime.utcnow()
     query = (
-        Motd.query.filter(Motd.published.is_(True))
+        # Plain boolean test so PostgreSQL can match the ix_motd_live predicate.
+        Motd.query.filter(Motd.published)
         .filter((Motd.starts_at.is_(None)) | (Motd.starts_at <= now))
         .filter((Motd.ends_at.is_(None)) | (Motd.ends_at >= now))
         .outerjoin(MotdSeen, (MotdSeen.motd_id == Motd.id) & (MotdSeen.user_id == user_id))
@@ -167,13 +174,7 @@ def feed():
     favorited_ids: set[int] = set()
     following_ids: set[int] = set()
     if current_user.is_authenticated:
-        liked_ids = {row.image_id for row in current_user.likes.with_entities(Like.image_id).all()}
-        favorited_ids = {
-            row.image_id for row in current_user.favorites.with_entities(Favorite.image_id).all()
-        }
-        following_ids = {
-            row.followed_id for row in current_user.following.with_entities(Follow.followed_id).all()
-        }
+        liked_ids, favorited_ids, following_ids = load_user_edge_sets(current_user.id)
     selection = build_feed_selection(
         liked_ids=liked_ids,
         following_ids=following_ids,
@@ -232,28 +233,14 @@ def my_feed():
     form = SearchForm()
     comment_form = CommentForm()
     per_page = current_app.config["FEED_PAGE_SIZE"]
-    liked_ids = {row.image_id for row in current_user.likes.with_entities(Like.image_id).all()}
-    favorited_ids = {row.image_id for row in current_user.favorites.with_entities(Favorite.image_id).all()}
-    following_ids = {row.followed_id for row in current_user.following.with_entities(Follow.followed_id).all()}
-    cursor_point = None
-    cursor_image_id = None
+    liked_ids, favorited_ids, following_ids = load_user_edge_sets(current_user.id)
     cursor = request.args.get("cursor")
-    if cursor:
-        try:
-            timestamp, image_id = cursor.split("_")
-            cursor_point = datetime.fromisoformat(timestamp)
-            cursor_image_id = int(image_id)
-        except ValueError:
-            cursor_point = None
-            cursor_image_id = None
+    cursor_point, cursor_image_id = parse_cursor_point(cursor)
 
     query = Image.query.filter_by(user_id=current_user.id)
     total_feeds = query.count()
     if cursor_point:
-        query = query.filter(
-            (Image.observed_at < cursor_point)
-            | ((Image.observed_at == cursor_point) & (Image.id < cursor_image_id))
-        )
+        query = query.filter(observed_before(cursor_point, cursor_image_id))
 
     ordered = (
         query.order_by(Image.observed_at.desc(), Image.id.desc())
@@ -299,15 +286,10 @@ def my_feed():
 @bp.route("/saved")
 @login_required
 def saved():
-    liked_ids = {row.image_id for row in current_user.likes.with_entities(Like.image_id).all()}
-    favorited_ids = {
-        row.image_id for row in current_user.favorites.with_entities(Favorite.image_id).all()
-    }
-    following_ids = {
-        row.followed_id for row in current_user.following.with_entities(Follow.followed_id).all()
-    }
+    liked_ids, favorited_ids, following_ids = load_user_edge_sets(current_user.id)
     saved_images = (
-        Image.query.join(Favorite, Favorite.image_id == Image.id)
+        Image.query.options(selectinload(Image.uploader))
+        .join(Favorite, Favorite.image_id == Image.id)
         .filter(Favorite.user_id == current_user.id)
         .order_by(Image.created_at.desc(), Image.id.desc())
         .all()
@@ -734,7 +716,8 @@ def search():
         if form.query.data:
             query = query.filter(Image.notes.ilike(f"%{form.query.data}%"))
         ordered = (
-            query.order_by(Image.created_at.desc(), Image.id.desc())
+            query.options(selectinload(Image.uploader))
+            .order_by(Image.created_at.desc(), Image.id.desc())
             .limit(per_page + 1)
             .all()
         )
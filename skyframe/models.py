@@ -4,10 +4,46 @@ from datetime import datetime
 from argon2 import PasswordHasher
 from flask import url_for
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 
+from .config import Config
 from .extensions import db
 
-ph = PasswordHasher(time_cost=2, memory_cost=102400, parallelism=8, hash_len=32)
+ph = PasswordHasher(
+    time_cost=Config.ARGON2_TIME_COST,
+    memory_cost=Config.ARGON2_MEMORY_COST,
+    parallelism=Config.ARGON2_PARALLELISM,
+    hash_len=32,
+)
+
+
+class HexDigest(db.TypeDecorator):
+    """Hex digest in Python, raw bytes in the database."""
+
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        return bytes.fromhex(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return bytes(value).hex()
+
+
+# 64-bit hex perceptual hashes are mirrored as signed BIGINTs so the distance
+# can be computed in SQL.
+def hash_bits(value: str | None) -> int | None:
+    if not value:
+        return None
+    try:
+        bits = int(value, 16)
+    except ValueError:
+        return None
+    return bits - (1 << 64) if bits >= 1 << 63 else bits
 
 
 class User(UserMixin, db.Model):
@@ -53,9 +89,14 @@ class User(UserMixin, db.Model):
 
     def check_password(self, password: str) -> bool:
         try:
-            return ph.verify(self.password_hash, password)
+            ph.verify(self.password_hash, password)
         except Exception:
             return False
+        # Bring hashes made under older cost settings up to the current ones;
+        # the caller commits.
+        if ph.check_needs_rehash(self.password_hash):
+            self.password_hash = ph.hash(password)
+        return True
 
     @property
     def is_active(self) -> bool:
@@ -89,11 +130,12 @@ class User(UserMixin, db.Model):
 class Image(db.Model):
     __tablename__ = "images"
     __table_args__ = (
-        db.Index("ix_images_category", "category"),
-        db.Index("ix_images_object", "object_name"),
-        db.Index("ix_images_observer", "observer_name"),
-        db.Index("ix_images_observed_at", "observed_at"),
+        db.Index("ix_images_category_created", "category", db.text("created_at DESC")),
+        db.Index("ix_images_object_created", "object_name", db.text("created_at DESC")),
+        db.Index("ix_images_observer_created", "observer_name", db.text("created_at DESC")),
+        db.Index("ix_images_observed_id", db.text("observed_at DESC"), db.text("id DESC")),
         db.Index("ix_images_created_at", "created_at"),
+        db.Index("ix_images_signature_sha256", "signature_sha256"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -111,14 +153,20 @@ class Image(db.Model):
     notes = db.Column(db.Text)
     allow_scientific_use = db.Column(db.Boolean, default=False, nullable=False)
     watermark_hash = db.Column(db.String(64))
-    signature_sha256 = db.Column(db.String(64))
+    signature_sha256 = db.Column(HexDigest(32))
     signature_phash = db.Column(db.String(16))
     signature_dhash = db.Column(db.String(16))
+    signature_phash_bits = db.Column(db.BigInteger)
+    signature_dhash_bits = db.Column(db.BigInteger)
     seeing_rating = db.Column(db.Integer, nullable=True)
     transparency_rating = db.Column(db.Integer, nullable=True)
     bortle_rating = db.Column(db.Integer, nullable=True)
     max_exposure_time = db.Column(db.Float, nullable=True)
     derotation_time = db.Column(db.Float)
+    # Denormalized engagement counters, kept in step by the API write paths.
+    like_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    favorite_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    comment_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     likes = db.relationship("Like", backref="image", lazy="dynamic", cascade="all, delete-orphan")
@@ -127,15 +175,24 @@ class Image(db.Model):
     )
     comments = db.relationship("Comment", backref="image", lazy="dynamic", cascade="all, delete-orphan")
 
-    def like_count(self):
-        return self.likes.count()
+    @validates("signature_phash", "signature_dhash")
+    def _sync_hash_bits(self, key, value):
+        # Keep the integer copies used for Hamming distance in SQL in step.
+        setattr(self, f"{key}_bits", hash_bits(value))
+        return value
 
-    def favorite_count(self):
-        return self.favorites.count()
+    @property
+    def thumb_version(self) -> str:
+        # The signature backfill rewrites thumbnails in place and always
+        # changes the hash, so thumb URLs carrying this can stay immutable.
+        return (self.watermark_hash or "")[:8] or str(int(self.created_at.timestamp()))
 
 
 class Like(db.Model):
     __tablename__ = "likes"
+    __table_args__ = (
+        db.Index("ix_likes_image_user", "image_id", "user_id", postgresql_include=["created_at"]),
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
     image_id = db.Column(db.Integer, db.ForeignKey("images.id"), primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -143,6 +200,9 @@ class Like(db.Model):
 
 class Favorite(db.Model):
     __tablename__ = "favorites"
+    __table_args__ = (
+        db.Index("ix_favorites_image_user", "image_id", "user_id"),
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
     image_id = db.Column(db.Integer, db.ForeignKey("images.id"), primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -150,6 +210,9 @@ class Favorite(db.Model):
 
 class Follow(db.Model):
     __tablename__ = "follows"
+    __table_args__ = (
+        db.Index("ix_follows_followed_follower", "followed_id", "follower_id"),
+    )
     follower_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
     followed_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -171,12 +234,11 @@ class NotificationRead(db.Model):
         db.UniqueConstraint(
             "user_id",
             "event_type",
+            "event_created_at",
             "image_id",
             "actor_id",
-            "event_created_at",
             name="uq_notification_read_event",
         ),
-        db.Index("ix_notification_reads_user_type", "user_id", "event_type"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -193,7 +255,7 @@ class NotificationRead(db.Model):
 class Motd(db.Model):
     __tablename__ = "motd"
     __table_args__ = (
-        db.Index("ix_motd_published", "published"),
+        db.Index("ix_motd_live", "starts_at", "ends_at", postgresql_where=db.text("published")),
         db.Index("ix_motd_window", "starts_at", "ends_at"),
     )
 
@@ -223,7 +285,9 @@ class FeedSeen(db.Model):
     __tablename__ = "feed_seen"
     __table_args__ = (
         db.UniqueConstraint("user_id", "image_id", name="uq_feed_seen_user_image"),
-        db.Index("ix_feed_seen_user_seen_at", "user_id", "seen_at"),
+        db.Index(
+            "ix_feed_seen_user_seen_image", "user_id", "seen_at", postgresql_include=["image_id"]
+        ),
     )
 
     id = db.Column(db.Integer, primary_key=True)
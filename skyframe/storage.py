@@ -4,6 +4,7 @@ import uuid
 import hashlib
 import math
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 from PIL import Image, ImageOps, ImageDraw, ImageFont
@@ -12,6 +13,12 @@ from werkzeug.utils import secure_filename
 
 from .config import Config
 
+_BASE_STRIP_RE = re.compile(r"[^A-Za-z0-9_-]")
+_SEGMENT_STRIP_RE = re.compile(r"[^A-Za-z0-9_]")
+_OWNER_STRIP_RE = re.compile(r"[^A-Za-z0-9 _-]")
+_WATERMARK_COMMENT_RE = re.compile(r"SkyFrame\\s+([0-9a-fA-F]+)")
+_STORED_STEM_RE = re.compile(r"^(.*?)(?:-[0-9a-f]{6})?$", re.IGNORECASE)
+
 
 def _ensure_dirs(*paths):
     for path in paths:
@@ -28,14 +35,14 @@ def _winjupos_base(name: str | None) -> str:
         return "frame"
     cleaned = os.path.splitext(secure_filename(name.strip()))[0]
     cleaned = cleaned.replace(" ", "_")
-    cleaned = re.sub(r"[^A-Za-z0-9_-]", "", cleaned)
+    cleaned = _BASE_STRIP_RE.sub("", cleaned)
     cleaned = cleaned or "frame"
     return cleaned[:64]
 
 
 def _build_watermark_payload(owner_name: str | None) -> tuple[str, str]:
     owner = owner_name.strip() if owner_name else "SkyFrame"
-    owner = re.sub(r"[^A-Za-z0-9 _-]", "", owner) or "SkyFrame"
+    owner = _OWNER_STRIP_RE.sub("", owner) or "SkyFrame"
     timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H%M%S")
     payload = f"{owner}|{timestamp}"
     signature = hashlib.sha256(payload.encode()).hexdigest()[:16]
@@ -66,40 +73,43 @@ def _image_to_grayscale(image: Image.Image, size: tuple[int, int]) -> list[list[
     return [pixels[row * width : (row + 1) * width] for row in range(height)]
 
 
-def _dct_1d(values: list[float], cos_table: list[list[float]], alpha: list[float]) -> list[float]:
-    size = len(values)
-    output = [0.0] * size
-    for k in range(size):
+_PHASH_SIZE = 32
+_PHASH_BLOCK = 8
+# Only the low-frequency 8x8 corner of the 32x32 DCT feeds the hash, so the
+# basis rows and scale factors for those coefficients are built once.
+_PHASH_COS_TABLE = [
+    [math.cos((math.pi * (2 * n + 1) * k) / (2 * _PHASH_SIZE)) for n in range(_PHASH_SIZE)]
+    for k in range(_PHASH_BLOCK)
+]
+_PHASH_ALPHA = [math.sqrt(1 / _PHASH_SIZE)] + [math.sqrt(2 / _PHASH_SIZE)] * (_PHASH_BLOCK - 1)
+
+
+def _dct_1d(values: list[float]) -> list[float]:
+    output = [0.0] * _PHASH_BLOCK
+    for k in range(_PHASH_BLOCK):
         total = 0.0
-        cos_row = cos_table[k]
-        for n in range(size):
+        cos_row = _PHASH_COS_TABLE[k]
+        for n in range(_PHASH_SIZE):
             total += values[n] * cos_row[n]
-        output[k] = total * alpha[k]
+        output[k] = total * _PHASH_ALPHA[k]
     return output
 
 
-def _dct_2d(matrix: list[list[float]], cos_table: list[list[float]], alpha: list[float]) -> list[list[float]]:
-    size = len(matrix)
-    row_dct = [_dct_1d(row, cos_table, alpha) for row in matrix]
-    result = [[0.0] * size for _ in range(size)]
-    for col in range(size):
-        column = [row_dct[row][col] for row in range(size)]
-        column_dct = _dct_1d(column, cos_table, alpha)
-        for row in range(size):
+def _dct_2d_low(matrix: list[list[float]]) -> list[list[float]]:
+    row_dct = [_dct_1d(row) for row in matrix]
+    result = [[0.0] * _PHASH_BLOCK for _ in range(_PHASH_BLOCK)]
+    for col in range(_PHASH_BLOCK):
+        column = [row_dct[row][col] for row in range(_PHASH_SIZE)]
+        column_dct = _dct_1d(column)
+        for row in range(_PHASH_BLOCK):
             result[row][col] = column_dct[row]
     return result
 
 
 def _phash_from_image(image: Image.Image) -> str:
-    size = 32
-    small = _image_to_grayscale(image, (size, size))
-    cos_table = [
-        [math.cos((math.pi * (2 * n + 1) * k) / (2 * size)) for n in range(size)]
-        for k in range(size)
-    ]
-    alpha = [math.sqrt(1 / size)] + [math.sqrt(2 / size)] * (size - 1)
-    dct = _dct_2d(small, cos_table, alpha)
-    block = [dct[row][col] for row in range(8) for col in range(8)]
+    small = _image_to_grayscale(image, (_PHASH_SIZE, _PHASH_SIZE))
+    dct = _dct_2d_low(small)
+    block = [value for row in dct for value in row]
     median_values = sorted(block[1:])
     median = median_values[len(median_values) // 2]
     hash_value = 0
@@ -119,11 +129,18 @@ def _dhash_from_image(image: Image.Image) -> str:
     return f"{hash_value:016x}"
 
 
+_HASH_CHUNK_SIZE = 1 << 20
+
+
 def _sha256_file(path: Path) -> str:
     digest = hashlib.sha256()
-    with path.open("rb") as handle:
-        for chunk in iter(lambda: handle.read(8192), b""):
-            digest.update(chunk)
+    buffer = bytearray(_HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as handle:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while read := handle.readinto(buffer):
+            digest.update(view[:read])
     return digest.hexdigest()
 
 
@@ -131,18 +148,31 @@ def sha256_file(path: Path) -> str:
     return _sha256_file(path)
 
 
+def sha256_stream(stream) -> str:
+    digest = hashlib.sha256()
+    stream.seek(0)
+    while chunk := stream.read(_HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
 def perceptual_hashes_for_file(path: Path) -> tuple[str, str]:
     image = Image.open(path)
     image = image.convert("RGB")
     return _phash_from_image(image), _dhash_from_image(image)
 
 
+def perceptual_hashes_for_stream(stream) -> tuple[str, str]:
+    stream.seek(0)
+    image = Image.open(stream)
+    image = image.convert("RGB")
+    return _phash_from_image(image), _dhash_from_image(image)
+
+
 def perceptual_hashes_for_bytes(data: bytes) -> tuple[str, str]:
     from io import BytesIO
 
-    image = Image.open(BytesIO(data))
-    image = image.convert("RGB")
-    return _phash_from_image(image), _dhash_from_image(image)
+    return perceptual_hashes_for_stream(BytesIO(data))
 
 
 def apply_watermark_to_file(path: Path, owner_name: str | None) -> str:
@@ -183,7 +213,7 @@ def read_watermark_comment_bytes(data: bytes) -> str | None:
             pos = segment.find(marker)
             if pos != -1:
                 comment = segment[pos:].decode("utf-8", "ignore")
-                match = re.search(r"SkyFrame\\s+([0-9a-fA-F]+)", comment)
+                match = _WATERMARK_COMMENT_RE.search(comment)
                 if match:
                     return match.group(1).lower()
         idx = segment_end
@@ -195,7 +225,7 @@ def read_watermark_comment_bytes(data: bytes) -> str | None:
         if isinstance(comment, bytes):
             comment = comment.decode("utf-8", "ignore")
         if isinstance(comment, str):
-            match = re.search(r"SkyFrame\\s+([0-9a-fA-F]+)", comment)
+            match = _WATERMARK_COMMENT_RE.search(comment)
             if match:
                 return match.group(1).lower()
     except Exception:
@@ -235,11 +265,18 @@ def process_image_upload(
     image.thumbnail(Config.IMAGE_PROCESS_SIZE, Image.LANCZOS)
     watermark_text, watermark_hash = _build_watermark_payload(owner_name)
     watermarked = _apply_invisible_watermark(image, watermark_text)
-    watermarked.save(img_path, "JPEG", quality=90, progressive=True, comment=f"SkyFrame {watermark_hash}".encode())
-    signature_sha256 = _sha256_file(img_path)
-    signature_phash, signature_dhash = perceptual_hashes_for_file(img_path)
+    # Encode once in memory and derive the signatures and thumbnail from those
+    # bytes rather than reading the saved file back three times.
+    from io import BytesIO
+
+    encoded = BytesIO()
+    watermarked.save(encoded, "JPEG", quality=90, progressive=True, comment=f"SkyFrame {watermark_hash}".encode())
+    data = encoded.getvalue()
+    img_path.write_bytes(data)
+    signature_sha256 = hashlib.sha256(data).hexdigest()
+    signature_phash, signature_dhash = perceptual_hashes_for_bytes(data)
 
-    thumb = Image.open(img_path)
+    thumb = Image.open(BytesIO(data))
     thumb.thumbnail(Config.THUMB_SIZE, Image.LANCZOS)
     thumb.save(thumb_path, "JPEG", quality=80, progressive=True)
 
@@ -273,18 +310,21 @@ def save_avatar_upload(file_storage: FileStorage) -> str:
     return str(avatar_path.relative_to(Config.UPLOAD_PATH))
 
 
+# Object, filter and observer names repeat heavily across a feed page, so the
+# normalization behind each download label is memoized.
+@lru_cache(maxsize=4096)
 def _sanitize_segment(value: str | None) -> str | None:
     if not value:
         return None
     cleaned = secure_filename(value.strip())
     cleaned = cleaned.replace(" ", "_")
-    cleaned = re.sub(r"[^A-Za-z0-9_]", "", cleaned)
+    cleaned = _SEGMENT_STRIP_RE.sub("", cleaned)
     return cleaned or None
 
 
 def winjupos_label_from_path(path: str) -> str:
     stem = Path(path).stem
-    match = re.match(r"^(.*?)(?:-[0-9a-f]{6})?$", stem, re.IGNORECASE)
+    match = _STORED_STEM_RE.match(stem)
     base = match.group(1) if match else stem
     return _winjupos_base(base)
 
@@ -295,14 +335,25 @@ def winjupos_label_from_metadata(
     filter_value: str | None,
     uploader_name: str | None,
 ) -> str:
-    timestamp = (
-        observed_at.strftime("%Y-%m-%d_%H%M")
-        if observed_at
-        else datetime.utcnow().strftime("%Y-%m-%d_%H%M")
-    )
+    if not observed_at:
+        # Falls back to the current time, so this path is never memoized.
+        return _winjupos_label(object_name, datetime.utcnow(), filter_value, uploader_name)
+    return _cached_winjupos_label(object_name, observed_at, filter_value, uploader_name)
+
+
+def _winjupos_label(
+    object_name: str | None,
+    observed_at: datetime,
+    filter_value: str | None,
+    uploader_name: str | None,
+) -> str:
+    timestamp = observed_at.strftime("%Y-%m-%d_%H%M")
     filter_seg = _sanitize_segment((filter_value or "RGB").upper()) or "RGB"
     observer_seg = _sanitize_segment(uploader_name) or "Observer"
     object_seg = _sanitize_segment(object_name) or "Object"
     parts = [timestamp, filter_seg, observer_seg, object_seg]
     base = "_".join(part for part in parts if part)
     return f"o{base}"
+
+
+_cached_winjupos_label = lru_cache(maxsize=4096)(_winjupos_label)
@@ -119,6 +119,56 @@
     };
     const isCompactView = () => window.matchMedia("(max-width: 991px)").matches;
 
+    const renderPlanetary = (planetary) => `
+        <p class="meta-info small mb-0">
+            RA: ${planetary.ra}° · Dec: ${planetary.dec}°
+        </p>
+        <p class="meta-info small mb-0">Distance: ${planetary.distance_au} AU</p>
+        ${
+            planetary.altitude !== undefined && planetary.azimuth !== undefined
+                ? `<p class="meta-info small mb-0">
+                     Altitude: ${planetary.altitude}° · Azimuth: ${planetary.azimuth}°
+                   </p>`
+                : ""
+        }
+        ${
+            !planetary.has_location
+                ? `<p class="meta-info small mb-0 fst-italic text-white">
+                     Alt/Az unavailable – uploader has not provided observatory coordinates.
+                   </p>`
+                : ""
+        }
+        ${
+            planetary.jupiter_systems
+                ? `<p class="meta-info small mb-0 mt-1">
+                     <strong>Jupiter System</strong>
+                     I: ${planetary.jupiter_systems.system_i}° ·
+                     II: ${planetary.jupiter_systems.system_ii}° ·
+                     III: ${planetary.jupiter_systems.system_iii}°
+                   </p>`
+                : ""
+        }
+    `;
+
+    const loadPlanetary = async (sheet) => {
+        const target = sheet.querySelector("[data-planetary-url]");
+        if (!target || target.dataset.planetaryLoaded) return;
+        target.dataset.planetaryLoaded = "true";
+        try {
+            const resp = await fetch(target.dataset.planetaryUrl);
+            if (!resp.ok) {
+                throw new Error("Failed to load planetary data");
+            }
+            const data = await resp.json();
+            if (data.planetary_data) {
+                target.innerHTML = renderPlanetary(data.planetary_data);
+                target.classList.remove("d-none");
+            }
+        } catch (error) {
+            delete target.dataset.planetaryLoaded;
+        }
+    };
+
     const syncMetadataSheet = (sheet) => {
         if (!sheet || sheet.dataset.userToggled === "true") return;
         if (metadataMedia.matches) {
@@ -134,6 +184,9 @@
                 sheet.addEventListener("toggle", () => {
                     sheet.dataset.userToggled = "true";
                     const isOpen = sheet.hasAttribute("open");
+                    if (isOpen) {
+                        loadPlanetary(sheet);
+                    }
                     if (document.body) {
                         if (isCompactView()) {
                             document.body.classList.toggle("metadata-open", isOpen);
@@ -299,41 +352,10 @@
                 </div>
             `
             : "";
-        const planetary = image.planetary_data;
-        let planetaryContent = "";
-        if (planetary) {
-            planetaryContent = `
-            <div class="post-metadata px-3 py-3">
-                <p class="meta-info small mb-0">
-                    RA: ${planetary.ra}° · Dec: ${planetary.dec}°
-                </p>
-                <p class="meta-info small mb-0">Distance: ${planetary.distance_au} AU</p>
-                ${
-                    planetary.altitude !== undefined && planetary.azimuth !== undefined
-                        ? `<p class="meta-info small mb-0">
-                             Altitude: ${planetary.altitude}° · Azimuth: ${planetary.azimuth}°
-                           </p>`
-                        : ""
-                }
-                ${
-                    !planetary.has_location
-                        ? `<p class="meta-info small mb-0 fst-italic text-white">
-                             Alt/Az unavailable – uploader has not provided observatory coordinates.
-                           </p>`
-                        : ""
-                }
-                ${
-                    planetary.jupiter_systems
-                        ? `<p class="meta-info small mb-0 mt-1">
-                             <strong>Jupiter System</strong>
-                             I: ${planetary.jupiter_systems.system_i}° ·
-                             II: ${planetary.jupiter_systems.system_ii}° ·
-                             III: ${planetary.jupiter_systems.system_iii}°
-                           </p>`
-                        : ""
-                }
-            </div>`;
-        }
+        // Ephemeris data is fetched when the metadata sheet is first opened.
+        const planetaryContent = image.planetary_data_url
+            ? `<div class="post-metadata px-3 py-3 d-none" data-planetary-url="${image.planetary_data_url}"></div>`
+            : "";
         const showExposureDetails =
             ["Deep Sky", "Comets"].includes(image.category) && image.max_exposure_time;
         card.innerHTML = `
@@ -0,0 +1,19 @@
+import os
+
+# Config reads DATABASE_URL at import time, so point it at memory first.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+
+from skyframe import create_minimal_app
+from skyframe.extensions import db
+
+
+@pytest.fixture
+def app():
+    app = create_minimal_app("default")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
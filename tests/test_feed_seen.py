@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from skyframe import feed
+from skyframe.extensions import db
+from skyframe.models import FeedSeen, Image, User
+
+RETENTION_DAYS = 30
+
+
+def _make_images(count: int) -> tuple[User, list[Image]]:
+    user = User(email="viewer@example.com", username="viewer", password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    base = datetime.utcnow() - timedelta(days=1)
+    images = [
+        Image(
+            user_id=user.id,
+            file_path=f"{n}.png",
+            thumb_path=f"{n}_thumb.png",
+            category="planet",
+            object_name="Jupiter",
+            observer_name="viewer",
+            observed_at=base + timedelta(minutes=n),
+        )
+        for n in range(1, count + 1)
+    ]
+    db.session.add_all(images)
+    db.session.commit()
+    return user, images
+
+
+def _load_page(user: User) -> list[int]:
+    selection = feed.build_feed_selection(
+        liked_ids=set(),
+        following_ids=set(),
+        per_page=2,
+        cursor=None,
+        fresh_days=0,
+        seen_enabled=True,
+        seen_user_id=user.id,
+        seen_retention_days=RETENTION_DAYS,
+        seen_max_ids=100,
+    )
+    feed.persist_seen_for_feed(
+        user_id=user.id, images=selection.images, retention_days=RETENTION_DAYS
+    )
+    return [image.id for image in selection.images]
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["upsert", "select-then-write"])
+def test_expired_seen_rows_are_recorded_again(app, monkeypatch, upsert):
+    if not upsert:
+        monkeypatch.setattr(feed, "_SEEN_UPSERTS", {})
+    user, images = _make_images(4)
+    expired = datetime.utcnow() - timedelta(days=RETENTION_DAYS + 10)
+    db.session.add_all(
+        FeedSeen(user_id=user.id, image_id=image.id, seen_at=expired) for image in images
+    )
+    db.session.commit()
+
+    assert [_load_page(user) for _ in range(4)] == [[4, 3], [2, 1], [4, 3], [4, 3]]
+    cutoff = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+    assert FeedSeen.query.filter(FeedSeen.seen_at < cutoff).count() == 0
+
+
+def test_fresh_seen_rows_keep_their_timestamp(app):
+    user, images = _make_images(2)
+    first_seen = datetime.utcnow() - timedelta(days=1)
+    db.session.add(FeedSeen(user_id=user.id, image_id=images[0].id, seen_at=first_seen))
+    db.session.commit()
+
+    feed.persist_seen_for_feed(user_id=user.id, images=images, retention_days=RETENTION_DAYS)
+
+    rows = dict(db.session.query(FeedSeen.image_id, FeedSeen.seen_at))
+    assert rows[images[0].id] == first_seen
+    assert images[1].id in rows